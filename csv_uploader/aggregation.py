@@ -0,0 +1,126 @@
+import pandas as pd # type: ignore
+from jobs import no_progress
+from eligibility import coupled_courses, propagate_eligibility
+
+# A row of the attendance export is identified by these columns
+KEY_COLUMNS = ['NIM', 'COURSE CODE', 'CLASS', 'COMPONENT']
+
+# Aggregate a semester's main data into the NIM and COURSE table and the NIM table
+# report is called with the fraction of the work done so far, for background jobs
+# courses (see eligibility.coupled_courses) can be given when df is only part of the semester
+def aggregate_attendance(df, report, courses=None):
+    # Create a column for total present
+    df['TOTAL PRESENT'] = df['SESSION DONE'] - df['TOTAL ABSENCE']
+
+    # Calculate attendance so far and semester attendance
+    df['PERCENTAGE_ATTENDANCE'] = (df['TOTAL PRESENT'] / df['SESSION DONE']) * 100
+    df['PERCENTAGE_ATTENDANCE_SEMESTER'] = (df['TOTAL PRESENT'] / df['TOTAL SESSION']) * 100
+
+     # Calculate projected percentage attendance (assume all sessions that have yet to happen to be present)
+    df['PROJECTED_ATTENDANCE_SEMESTER'] = (
+        1 - 
+        (df['TOTAL ABSENCE'] / 
+        df['TOTAL SESSION'])
+    ) * 100
+
+    # Format percentages
+    df[['PERCENTAGE_ATTENDANCE', 'PERCENTAGE_ATTENDANCE_SEMESTER', 'PROJECTED_ATTENDANCE_SEMESTER']] = df[
+        ['PERCENTAGE_ATTENDANCE', 'PERCENTAGE_ATTENDANCE_SEMESTER', 'PROJECTED_ATTENDANCE_SEMESTER']
+    ].round(2)
+
+    report(0.2)
+
+    # Students who fail LEC or LAB of a course that has both fail the other one too (see eligibility.py)
+    # INDIRECT FAIL is a new, temporary column to track the rows that only fail because of that
+    df['ELIGIBLE'], df['INDIRECT FAIL'] = propagate_eligibility(df, df['TOTAL ABSENCE'] <= df['MAX ABSENCE'], courses)
+
+    report(0.4)
+
+    # Drop columns
+    df.drop(columns=['ACAD CAREER', 'STRM', 'BINUSIAN ID', 'TOTAL ABSENCE', 'MAX ABSENCE', 'SKS'], inplace=True)
+
+    # Rename columns
+    df.columns = ['NIM', 'NAME', 'MAJOR', 'COURSE CODE', 'COURSE NAME', 'CLASS', 'COMPONENT', 'TOTAL SEMESTER SESSIONS', 'SESSIONS DONE', 'TOTAL PRESENT', 'ATTENDANCE %', 'ATTENDANCE SEMESTER %', 'PROJECTED ATTENDANCE SEMESTER %', 'ELIGIBLE', 'INDIRECT FAIL']
+
+    report(0.5)
+
+    # Further processing for NIM table
+    # Find number of unique course codes for each student
+    enrolled_courses = df.groupby('NIM')['COURSE CODE'].nunique().reset_index()
+    enrolled_courses.columns = ['NIM', 'NUMBER OF ENROLLED COURSES']
+
+    report(0.6)
+
+    # Find number of failed courses with unique course codes
+    failed_courses = df[df['ELIGIBLE'] == False].groupby('NIM')['COURSE CODE'].nunique().reset_index()
+    failed_courses.columns = ['NIM', 'NUMBER OF FAILED COURSES']
+
+    report(0.7)
+
+    # Merge results to create a NIM, number of enrolled courses, and number of failed courses table
+    grouped_nim = enrolled_courses.merge(failed_courses, on='NIM', how='left').fillna(0)
+
+    # fillna forces column into float, so converting back to int
+    grouped_nim['NUMBER OF FAILED COURSES'] = grouped_nim['NUMBER OF FAILED COURSES'].astype(int)
+
+    report(0.8)
+
+    # Calculate the percentage of failed courses
+    grouped_nim['PERCENTAGE OF FAILED COURSES'] = round(((grouped_nim['NUMBER OF FAILED COURSES'] / grouped_nim['NUMBER OF ENROLLED COURSES']) * 100), 2)
+
+    # Merge grouped_nim with NAME and MAJOR columns
+    grouped_nim = df[['NIM', 'NAME', 'MAJOR']].drop_duplicates().merge(grouped_nim, on='NIM', how='left')
+
+    report(0.9)
+
+    # Reorder columns
+    grouped_nim.columns = ['NIM', 'NAME', 'MAJOR', 'NUMBER OF ENROLLED COURSES', 'NUMBER OF FAILED COURSES', 'PERCENTAGE OF FAILED COURSES']
+
+    return df, grouped_nim
+
+# Aggregate tables of the loaded semester, run directly or as a background job
+def aggregate_tables_job(report, main_data):
+    # aggregate_attendance changes the frame it is given, the workspace copy stays as uploaded
+    return aggregate_attendance(main_data.copy(), report)
+
+# NIMs of students with a row that was added, removed or changed between two snapshots of a semester
+def changed_students(old, new):
+    changed_rows = pd.concat([old, new], ignore_index=True).drop_duplicates(keep=False)
+    changed = set(changed_rows['NIM'])
+
+    # A course gaining or losing its coupled components (LEC and LAB) changes the indirect fails of everyone taking it
+    old_courses, new_courses = coupled_courses(old), coupled_courses(new)
+    for rule in new_courses:
+        flipped_courses = set(old_courses[rule]) ^ set(new_courses[rule])
+        changed |= set(new.loc[new['COURSE CODE'].isin(flipped_courses), 'NIM'])
+
+    return changed
+
+# Aggregate tables of a newer snapshot of a semester, patched from the tables of the previous snapshot
+# Only students whose rows changed are aggregated again, everyone else keeps their old rows
+def patch_aggregates(old, new, old_nim_course, old_nim):
+    # Rows can only be matched between snapshots when every row has its own key
+    if list(old.columns) != list(new.columns) or old.duplicated(KEY_COLUMNS).any() or new.duplicated(KEY_COLUMNS).any():
+        return aggregate_attendance(new.copy(), no_progress)
+
+    new = new.reset_index(drop=True)
+    changed = changed_students(old, new)
+    is_changed = new['NIM'].isin(changed)
+
+    # Rows of unchanged students, in their position in the new snapshot
+    kept = new.loc[~is_changed, KEY_COLUMNS].merge(old_nim_course, on=KEY_COLUMNS, how='left')[old_nim_course.columns]
+    kept.index = new.index[~is_changed]
+
+    if is_changed.any():
+        changed_nim_course, changed_nim = aggregate_attendance(new[is_changed].copy(), no_progress, coupled_courses(new))
+        nim_course = pd.concat([kept, changed_nim_course]).sort_index()
+        counts = pd.concat([old_nim[~old_nim['NIM'].isin(changed)], changed_nim])
+    else:
+        nim_course = kept
+        counts = old_nim
+
+    # Students are listed in the order they first appear in the new snapshot, like a full aggregation
+    counts = counts.drop(columns=['NAME', 'MAJOR']).drop_duplicates('NIM')
+    grouped_nim = new[['NIM', 'NAME', 'MAJOR']].drop_duplicates().merge(counts, on='NIM', how='left')
+
+    return nim_course, grouped_nim
@@ -1,38 +1,153 @@
-import io
-import fnmatch
-from flask import Flask, request, render_template, jsonify, send_file # type: ignore
-import pandas as pd # type: ignore
+import json
+import contextlib
+import itertools
+import hashlib
+import threading
+from flask import Blueprint, Flask, Response, current_app, has_app_context, request, render_template, send_file, session # type: ignore
 import os
-import glob
 import re
-import csv
-import numpy as np # type: ignore
-from flask_sqlalchemy import SQLAlchemy # type: ignore
+from sqlalchemy.exc import OperationalError # type: ignore
+from database import db, AttendanceFile, StudentIndex, SemesterAggregate, SemesterTables, JobStore, bulk_insert, configure_sqlite, begin_write
+from cache import SemesterCache, ResponseCache
+from compression import compress_response, accepted_encoding
+from jobs import JobManager, no_progress
+from workspace import WorkspaceStore
+from metrics import jsonify, phase, count_rows, track_queries, start_request, finish_request, expose
+from lazy import lazy_import
+
+# Modules built on pandas are imported by the first request that uses them, so a web process starts without loading
+# pandas and pyarrow (see lazy.py). Use them as storage.encode_semester and so on, a from import would load them right away.
+storage = lazy_import('storage')
+schema = lazy_import('schema')
+tables = lazy_import('tables')
+ingest = lazy_import('ingest')
+terms = lazy_import('terms')
+aggregation = lazy_import('aggregation')
+study_period = lazy_import('study_period')
+export = lazy_import('export')
+
+# Routes of the app, registered on the app by create_app
+# cli_group=None puts its commands at the top level: flask --app app init-db
+bp = Blueprint('attendance', __name__, cli_group=None)
 
-app = Flask(__name__)
-app.config['UPLOAD_FOLDER'] = 'uploaded_files'
-
-# Configure Database
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
-app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.join(BASE_DIR, "attendance.db")}'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
-db = SQLAlchemy(app)
+# Build and configure the app, config overrides the defaults (the benchmark uses it for a scratch database)
+# Safe to call in every web process of a multi-process server, see wsgi.py
+# Doesn't touch the database, that is done by init_app
+def create_app(config=None):
+    app = Flask(__name__)
+
+    # Signs the session cookie that links a browser to its workspace
+    # Web processes only share sessions when they share the key, so set SECRET_KEY when running more than one
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', os.urandom(24).hex())
+
+    # Memory budget of each web process for the workspace frames it keeps in memory, the frames themselves are in the database
+    app.config['WORKSPACE_MEMORY_BYTES'] = 1024 * 1024 * 1024
+
+    # Workspaces that haven't been used for this long are dropped
+    app.config['WORKSPACE_TTL_SECONDS'] = 4 * 60 * 60
+
+    # Folder of the workspace frame files, every web process of the app has to see the same folder
+    app.config['WORKSPACE_FOLDER'] = os.environ.get('WORKSPACE_FOLDER', os.path.join(BASE_DIR, 'uploaded_files'))
+
+    # Requests slower than this are logged with their phase timings, unset to turn the log off
+    app.config['SLOW_REQUEST_SECONDS'] = float(os.environ['SLOW_REQUEST_SECONDS']) if os.environ.get('SLOW_REQUEST_SECONDS') else None
+
+    # Configure Database
+    # DATABASE_URL points the app at another database, the benchmark uses it to work on a scratch copy
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', f'sqlite:///{os.path.join(BASE_DIR, "attendance.db")}')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    # Memory budget for parsed semesters kept between requests, per web process
+    app.config['SEMESTER_CACHE_BYTES'] = 512 * 1024 * 1024
+
+    # Memory budget for rendered table responses, per web process
+    app.config['RESPONSE_CACHE_BYTES'] = 256 * 1024 * 1024
+
+    # Pool processes for background aggregation and BBS calculations, per web process
+    app.config['JOB_WORKERS'] = 2
+
+    if config:
+        app.config.update(config)
+
+    # Connections kept open per web process, enough for the request threads and the job threads of a busy process
+    # An in memory SQLite database lives in a single connection, so it keeps the default pool
+    if ':memory:' not in app.config['SQLALCHEMY_DATABASE_URI'] and app.config['SQLALCHEMY_DATABASE_URI'] != 'sqlite://':
+        app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {'pool_size': 10, 'max_overflow': 10, 'pool_timeout': 30})
+
+    db.init_app(app)
+
+    # Parsed semester DataFrames, shared by all chart endpoints
+    app.extensions['semester_cache'] = SemesterCache(app.config['SEMESTER_CACHE_BYTES'])
+
+    # Background jobs, polled through /jobs/<job_id>
+    app.extensions['job_manager'] = JobManager(app.config['JOB_WORKERS'], JobStore(app))
+
+    # Per session working data, so users working at the same time don't replace each other's files
+    app.extensions['workspaces'] = WorkspaceStore(app.config['WORKSPACE_MEMORY_BYTES'], app.config['WORKSPACE_TTL_SECONDS'],
+                                                app.config['WORKSPACE_FOLDER'])
 
-# Database structure
-class AttendanceFile(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    year = db.Column(db.Integer, nullable=False)
-    semester_type = db.Column(db.String(10), nullable=False)
-    csv_file = db.Column(db.LargeBinary, nullable=False)
+    # Rendered whole table responses, shared by all table routes (see table_view)
+    app.extensions['response_cache'] = ResponseCache(app.config['RESPONSE_CACHE_BYTES'])
 
-    __table_args__ = (db.UniqueConstraint('year', 'semester_type', name='unique_semester'),)
+    # Set by init_app once the database is set up
+    app.extensions['setup_lock'] = threading.Lock()
+    app.extensions['setup_done'] = False
 
-# Clear all locally saved files from previous runs
-def clear_upload_folder():
-    files = glob.glob(os.path.join(app.config['UPLOAD_FOLDER'], '*'))
-    for f in files:
-        os.remove(f)
+    app.register_blueprint(bp)
+
+    with app.app_context():
+        configure_sqlite(db.engine)
+
+        # Time every query for /metrics
+        track_queries(db.engine)
+
+    return app
+
+# Set up the database of an app built by create_app, only the first call does anything
+# Scripts and wsgi.py call it right after create_app, an app that wasn't set up runs it on its first request
+def init_app(app):
+    with app.extensions['setup_lock']:
+        if not app.extensions['setup_done']:
+            with app.app_context():
+                init_database()
+            app.extensions['setup_done'] = True
+
+    return app
+
+# Run the setup ahead of a deploy, from the csv_uploader folder: flask --app app init-db
+@bp.cli.command('init-db')
+def init_db_command():
+    init_app(current_app._get_current_object())
+
+# Create any tables that don't exist yet and bring databases of older versions up to date
+# Every web process runs this before it serves its first request, so it only changes what isn't done yet
+def init_database():
+    try:
+        db.create_all()
+    except OperationalError:
+        # Another web process created the same tables at the same time
+        db.session.rollback()
+        db.create_all()
+
+    migrate_attendance_files()
+
+    # Connections aren't shared with the processes a server forks off after the app was created
+    db.session.remove()
+    db.engine.dispose()
+
+def semester_cache():
+    return current_app.extensions['semester_cache']
+
+def job_manager():
+    return current_app.extensions['job_manager']
+
+def workspaces():
+    return current_app.extensions['workspaces']
+
+def response_cache():
+    return current_app.extensions['response_cache']
 
 # Function to determine semester type
 def get_semester_type(month):
@@ -44,55 +159,353 @@ def get_semester_type(month):
         return "Compact"
     return None
 
-# Create the upload folder if it does not exist
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+# Year and semester type of an attendance export from its file name, '<anything> DD-MM-YYYY.csv', and the date
+# of the export as a (year, month, day) tuple, raises ValueError with the message for the user
+def parse_attendance_filename(filename):
+    try:
+        parts = filename.split(' ')
+        date_part = parts[-1].replace('.csv', '').lstrip('-') # Get last part and remove .csv
+        day, month, year = map(int, date_part.split('-')) # Get date components
+    except ValueError:
+        raise ValueError('Invalid filename format.')
+
+    export_date = (year, month, day)
+
+    # January is part of the previous year's even odd semester
+    if month < 9:
+        year -= 1
+
+    semester_type = get_semester_type(month)
+    if not semester_type:
+        raise ValueError('Invalid semester received from file name.')
+
+    return year, semester_type, export_date
+
+# Columns added to tables after they were first created, with their SQL types
+ADDED_COLUMNS = {
+    'attendance_file': {'content_hash': 'VARCHAR(40)', 'row_count': 'INTEGER', 'column_names': 'TEXT'},
+    'workspace_frame': {'source_hash': 'VARCHAR(40)'}
+}
+
+# Store the data of a semester, together with its metadata
+def set_semester_blob(entry, blob, df):
+    entry.csv_file = blob
+    entry.content_hash = hashlib.sha1(blob).hexdigest()
+    entry.row_count = len(df)
+    entry.column_names = json.dumps(list(df.columns))
+
+# Columns of ADDED_COLUMNS the database doesn't have yet, by table, as seen through the engine or connection
+def missing_columns(bind):
+    missing = {}
+    for table, columns in ADDED_COLUMNS.items():
+        existing_columns = {column['name'] for column in db.inspect(bind).get_columns(table)}
+        names = [name for name in columns if name not in existing_columns]
+        if names:
+            missing[table] = names
+    return missing
+
+# Bring databases of older versions up to date: add the metadata columns and compress the semesters stored before
+def migrate_attendance_files():
+    if missing_columns(db.engine):
+        # Every web process gets here on its first request, the columns are checked again once this one holds the lock
+        begin_write()
+        for table, columns in missing_columns(db.session.connection()).items():
+            for name in columns:
+                db.session.execute(db.text(f"ALTER TABLE {table} ADD COLUMN {name} {ADDED_COLUMNS[table][name]}"))
+        db.session.commit()
 
-# Clear the upload folder when the app starts
-clear_upload_folder()
+    # Rows without a hash were stored as CSV text or uncompressed Parquet, converted one at a time
+    old_ids = [semester_id for (semester_id,) in db.session.query(AttendanceFile.id).filter(AttendanceFile.content_hash.is_(None))]
+    for semester_id in old_ids:
+        # Another process may have converted the row meanwhile
+        begin_write()
+        entry = db.session.get(AttendanceFile, semester_id)
+        if entry.content_hash is not None:
+            db.session.commit()
+            continue
+
+        old_hash = hashlib.sha1(entry.csv_file).hexdigest()
+
+        df = storage.decode_semester(entry.csv_file)
+        set_semester_blob(entry, storage.encode_semester(df), df)
+
+        # The data itself didn't change, so tables calculated from it stay valid
+        SemesterTables.query.filter_by(semester_id=semester_id, source_hash=old_hash).update({'source_hash': entry.content_hash})
+        db.session.commit()
+
+    # SQLite only gives the space of the old blobs back when the file is rebuilt
+    if old_ids and db.engine.dialect.name == 'sqlite':
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            connection.exec_driver_sql('VACUUM')
+
+# Load a semester from its database entry, reusing the parsed DataFrame when the same content was loaded before
+# The stored data is only read from the database when the semester isn't cached
+# With columns only those columns are decoded (see storage.decode_semester), and cached apart from the whole semester
+def load_semester(entry, columns=None):
+    key = (entry.year, entry.semester_type, entry.content_hash)
+
+    # The whole semester serves every set of columns once it is cached
+    df = semester_cache().get(key)
+    if df is not None and columns is not None:
+        df = df[columns]
+    elif df is None:
+        if columns is not None:
+            key = key + (tuple(columns),)
+            df = semester_cache().get(key)
+
+        if df is None:
+            with phase('decode'):
+                df = schema.apply_schema(storage.decode_semester(entry.csv_file, columns), schema.ATTENDANCE_SCHEMA)
+            semester_cache().put(key, df)
+
+    count_rows(df)
+    return df
+
+# Replace the student index entries of a semester with the rows of its DataFrame
+def index_semester(semester_id, df):
+    StudentIndex.query.filter_by(semester_id=semester_id).delete()
+
+    index_rows = list(zip(itertools.repeat(semester_id), df['NIM'].tolist(), df['COURSE CODE'].tolist(), range(len(df))))
+
+    if index_rows:
+        bulk_insert(StudentIndex.__table__, ['semester_id', 'nim', 'course_code', 'row'], index_rows)
+
+# Index semesters that were stored before the student index existed
+def index_missing_semesters():
+    indexed_ids = {semester_id for (semester_id,) in db.session.query(StudentIndex.semester_id).distinct()}
+    missing_ids = [semester_id for (semester_id,) in db.session.query(AttendanceFile.id) if semester_id not in indexed_ids]
+
+    for semester_id in missing_ids:
+        entry = db.session.get(AttendanceFile, semester_id)
+        index_semester(semester_id, load_semester(entry, columns=['NIM', 'COURSE CODE']))
+
+    if missing_ids:
+        db.session.commit()
+
+# Find the stored rows of a student, as a dictionary of semester id to row positions
+def find_student_rows(nim, course_code=None):
+    query = StudentIndex.query.filter_by(nim=nim)
+    if course_code is not None:
+        query = query.filter_by(course_code=course_code)
+
+    rows_by_semester = {}
+    for index_entry in query:
+        rows_by_semester.setdefault(index_entry.semester_id, []).append(index_entry.row)
+
+    return {semester_id: sorted(rows) for semester_id, rows in rows_by_semester.items()}
+
+# Store (or replace) the per student sums of a semester, as calculated by aggregate_semester and encoded by encode_semester
+# Blobs are encoded by the caller, before the write transaction starts
+def store_semester_aggregate(semester_id, aggregate_data):
+    aggregate_entry = SemesterAggregate.query.filter_by(semester_id=semester_id).first()
+    if aggregate_entry:
+        aggregate_entry.aggregate_file = aggregate_data
+    else:
+        aggregate_entry = SemesterAggregate(semester_id=semester_id, aggregate_file=aggregate_data)
+        db.session.add(aggregate_entry)
+
+    return aggregate_entry
+
+# Store (or replace) the encoded aggregate tables of a semester
+def store_semester_tables(semester_id, source_hash, nim_course_file, nim_file):
+    tables_entry = SemesterTables.query.filter_by(semester_id=semester_id).first()
+    if tables_entry is None:
+        tables_entry = SemesterTables(semester_id=semester_id)
+        db.session.add(tables_entry)
+
+    tables_entry.source_hash = source_hash
+    tables_entry.nim_course_file = nim_course_file
+    tables_entry.nim_file = nim_file
+    return tables_entry
+
+# The stored aggregate tables of a semester, None if they weren't calculated from the blob with this hash
+def load_semester_tables(semester_id, source_hash):
+    tables_entry = SemesterTables.query.filter_by(semester_id=semester_id).first()
+    if tables_entry is None or tables_entry.source_hash != source_hash:
+        return None
+
+    with phase('decode'):
+        return storage.decode_semester(tables_entry.nim_course_file), storage.decode_semester(tables_entry.nim_file)
+
+# Store an ingested attendance export as its semester, replacing the earlier snapshot of the semester if there is one
+# aggregate_data is the encoded per student totals, the caller commits
+# Returns the semester's entry and whether an earlier snapshot was replaced
+def store_semester(year, semester_type, semester_data, main_data, aggregate_data):
+    # Check if an entry for this specific semester already exists
+    existing_entry = AttendanceFile.query.filter_by(year=year, semester_type=semester_type).first()
+    replaced = existing_entry is not None
+
+    # Everything that is stored is calculated and encoded before the first write, so the write transaction
+    # (which other writers have to wait for) only does the writes
+    tables_data = None
+    if existing_entry:
+        # Patch the aggregate tables of the previous snapshot, instead of aggregating the whole semester again later
+        old_tables = load_semester_tables(existing_entry.id, existing_entry.content_hash)
+        if old_tables is not None:
+            nim_course, grouped_nim = aggregation.patch_aggregates(load_semester(existing_entry), main_data, *old_tables)
+            tables_data = (storage.encode_semester(nim_course), storage.encode_semester(grouped_nim))
+
+    if existing_entry:
+        set_semester_blob(existing_entry, semester_data, main_data)  # Replace existing file
+    else:
+        existing_entry = AttendanceFile(year=year, semester_type=semester_type) # New entry
+        set_semester_blob(existing_entry, semester_data, main_data)
+        db.session.add(existing_entry)
+        db.session.flush() # Assigns the id used by the student index
+
+    # Record where each student appears in this semester, and their totals
+    index_semester(existing_entry.id, main_data)
+    store_semester_aggregate(existing_entry.id, aggregate_data)
+    if tables_data is not None:
+        store_semester_tables(existing_entry.id, existing_entry.content_hash, *tables_data)
+
+    return existing_entry, replaced
+
+# Load the per student sums of a semester, None if the semester doesn't exist
+def load_semester_aggregate(year, semester_type):
+    semester_id = db.session.query(AttendanceFile.id).filter_by(year=year, semester_type=semester_type).scalar()
+    if semester_id is None:
+        return None
+
+    aggregate_entry = SemesterAggregate.query.filter_by(semester_id=semester_id).first()
+
+    # Semesters stored before aggregates existed get theirs calculated once
+    if aggregate_entry is None:
+        entry = db.session.get(AttendanceFile, semester_id)
+        aggregate_entry = store_semester_aggregate(semester_id, storage.encode_semester(ingest.aggregate_semester(load_semester(entry))))
+        db.session.commit()
+
+    key = (year, semester_type, hashlib.sha1(aggregate_entry.aggregate_file).hexdigest())
+
+    df = semester_cache().get(key)
+    if df is None:
+        with phase('decode'):
+            df = storage.decode_semester(aggregate_entry.aggregate_file)
+        semester_cache().put(key, df)
+
+    count_rows(df)
+    return df
+
+@bp.before_app_request
+def start_request_metrics():
+    start_request()
+
+@bp.before_app_request
+def ensure_setup():
+    if not current_app.extensions['setup_done']:
+        init_app(current_app._get_current_object())
+
+@bp.after_app_request
+def record_request_metrics(response):
+    duration, phase_times = finish_request(request, response)
+
+    slow_request_seconds = current_app.config['SLOW_REQUEST_SECONDS']
+    if slow_request_seconds is not None and duration is not None and duration > slow_request_seconds:
+        phases = ', '.join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in phase_times.items())
+        current_app.logger.warning(f"Slow request {request.method} {request.path}: {duration * 1000:.0f} ms ({phases})")
+
+    return response
+
+# Registered after the metrics hook so it runs before it, the metrics see the size that is actually sent
+@bp.after_app_request
+def compress(response):
+    return compress_response(request, response)
+
+# Background jobs hand their results over outside of the request, in an app context of their own
+def handoff_context(flask_app):
+    return contextlib.nullcontext() if has_app_context() else flask_app.app_context()
+
+# Calculations run in the request unless the client asks for a background job
+def run_in_background():
+    return bool((request.get_json(silent=True) or {}).get('background'))
+
+# Response of a table route, render(df) makes it from the workspace frame, None when the session has no such frame
+# Whole tables get a strong ETag made of the frame version and the request parameters: a browser that already has the
+# table gets 304 Not Modified, and a table that was rendered before comes from the response cache.
+# The ETag of a variant is only known once it is compressed, so a 304 is answered from the cached response when there is one.
+# The POST table routes only read, so they are answered like GETs. Pages of server side DataTables are always rendered.
+def table_view(name, params, render):
+    workspace = current_workspace()
+    version = workspace.version(name)
+    if version is None:
+        return None
+
+    if tables.is_server_side_request(params):
+        return render(workspace.get(name))
+
+    etag = hashlib.sha1(json.dumps([request.path, version, params], sort_keys=True, default=str).encode()).hexdigest()
+
+    key = (etag, accepted_encoding(request))
+    cached = response_cache().get(key)
+    if cached is not None:
+        body, mimetype, headers = cached
+        response = Response(body, mimetype=mimetype, headers=headers)
+    else:
+        response = render(workspace.get(name))
+        response.set_etag(etag)
+        compress_response(request, response)
+        response_cache().put(key, response.get_data(), response.mimetype,
+                             [(header, response.headers[header]) for header in ['ETag', 'Content-Encoding', 'Vary'] if header in response.headers])
+
+    # Compressed responses carry the ETag with the encoding appended (see compression.py) and small ones are sent as they are,
+    # so only the full ETag of the variant this request gets is a match, never the tag of another encoding
+    variant_etag, _ = response.get_etag()
+    if request.if_none_match.contains(variant_etag):
+        response = Response(status=304)
+        response.set_etag(variant_etag)
+        response.vary.add('Accept-Encoding')
+
+    # The browser has to ask every time, the table changes whenever it is calculated again
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+# Workspace of the session making the request, a new session gets an empty one
+def current_workspace():
+    workspace = workspaces().get(session.get('workspace'))
+    if session.get('workspace') != workspace.id:
+        session['workspace'] = workspace.id
+    return workspace
+
+# Frames of a BBS upload and everything calculated from it
+BBS_FRAMES = ['bbs_data', 'bbs_data_extended', 'bbs_data_student_list']
+
+# Frames that can be downloaded through /export, with the columns their major and component filters apply to
+EXPORT_FRAMES = {
+    'nim_course_aggregate': {'major': 'MAJOR', 'component': 'COMPONENT'},
+    'nim_aggregate': {'major': 'MAJOR'},
+    'bbs_data_extended': {'major': 'ACAD PLAN'},
+    'bbs_data_student_list': {}
+}
 
 # By default, load index.html
-@app.route('/')
+@bp.route('/')
 def index():
     return render_template('index.html')
 
 # Load dashboard.html
-@app.route('/dashboard')
+@bp.route('/dashboard')
 def dashboard():
     return render_template('dashboard.html')
 
 # Load BBS html
-@app.route('/bbs')
+@bp.route('/bbs')
 def bbs():
     return render_template('bbs.html')
 
-@app.route('/list_uploaded_files', methods=['GET'])
+@bp.route('/list_uploaded_files', methods=['GET'])
 def list_uploaded_files():
-    files = glob.glob(os.path.join(app.config['UPLOAD_FOLDER'], '*'))
-    filenames = [os.path.basename(f) for f in files if not fnmatch.fnmatch(os.path.basename(f), 'bbs_data_*.csv')]  
+    workspace = current_workspace()
+    filenames = [workspace.label(name) for name in workspace.names() if name not in BBS_FRAMES]
     return jsonify({'files': filenames})
 
-@app.route('/search_bbs_file', methods=['GET'])
+@bp.route('/search_bbs_file', methods=['GET'])
 def search_bbs_file():
-    all_bbs_files = glob.glob(os.path.join(app.config['UPLOAD_FOLDER'], 'bbs_data_*.csv'))
+    workspace = current_workspace()
+    return jsonify({'main': workspace.label('bbs_data'),
+                    'extended': 'bbs_data_extended' in workspace.names(),
+                    'student': 'bbs_data_student_list' in workspace.names()})
 
-    # Regex check to filter only the main data
-    pattern = re.compile(r"bbs_data_[0-9].*\.csv$")
-    main_file = [f for f in all_bbs_files if pattern.search(os.path.basename(f))]
-
-    # Other two files
-    extended_columns_file = glob.glob(os.path.join(app.config['UPLOAD_FOLDER'], 'bbs_data_extended.csv'))
-    student_list_file = glob.glob(os.path.join(app.config['UPLOAD_FOLDER'], 'bbs_data_student_list.csv'))
-
-    if len(main_file) > 1 or len(extended_columns_file) > 1 or len(student_list_file) > 1:
-        return jsonify({'error': 'Muliple files found'})
-    else:
-        if len(main_file) > 0:
-            base_main_file = os.path.basename(main_file[0])
-        else:
-            base_main_file = None
-        return jsonify({'main': base_main_file, 'extended': len(extended_columns_file) > 0, 'student': len(student_list_file) > 0})
-
-@app.route('/upload', methods=['POST'])
+@bp.route('/upload', methods=['POST'])
 def upload_file():
     if 'file' not in request.files:
         return jsonify({'error': 'No file uploaded'})
@@ -104,62 +517,27 @@ def upload_file():
 
     if file and file.filename.endswith('.csv'):
         try:
-            parts = file.filename.split(' ')
-            date_part = parts[-1].replace('.csv', '').lstrip('-') # Get last part and remove .csv
-            day, month, year = map(int, date_part.split('-')) # Get date components
-
-            # January is part of the previous year's even odd semester
-            if month < 9:
-                year -= 1
-                
-        except ValueError:
-            return jsonify({'error': 'Invalid filename format.'})
-        
-        semester_type = get_semester_type(month)
-        if not semester_type:
-            return jsonify({'error': 'Invalid semester received from file name.'})
-
-        # Load the CSV into a pandas DataFrame
-        df = pd.read_csv(file, delimiter=";", encoding="Windows-1252")
-
-        # Exclude rows where 'COURSE NAME' is one of the specified courses
-        excluded_courses = ['Excellence Program I', 'English Plus Stage One', 'English Plus Stage Two', 'Academic Advisory']
-        df = df[~df['COURSE NAME'].isin(excluded_courses)]
-
-        # Exclude rows where 'MAJOR' is 'Non Degree Program'
-        df = df[df['MAJOR'] != 'Non Degree Program']
-
-        # Filter out students with 0 sessions so far
-        df = df[df['SESSION DONE'] > 0]
-
-        # Consider both "Fashion Design" and "Fashion Management" as just 'Fashion'
-        df['MAJOR'].replace('Fashion Design', 'Fashion', inplace=True)
-        df['MAJOR'].replace('Fashion Management', 'Fashion', inplace=True)
+            year, semester_type, _ = parse_attendance_filename(file.filename)
+        except ValueError as e:
+            return jsonify({'error': str(e)})
 
-        # Remove old files
-        old_files = glob.glob(os.path.join(app.config['UPLOAD_FOLDER'], "main_data_*.csv"))
-        for old_file in old_files:
-            os.remove(old_file)
+        # Filter the upload in chunks, keeping it in this session's workspace and converting it to the columnar storage format
+        try:
+            with phase('decode'):
+                semester_data, main_data, student_totals = ingest.ingest_attendance(file)
+        except ValueError as e:
+            return jsonify({'error': str(e)})
 
-        # Save the uploaded CSV file locally for this instance
-        file_name = f"main_data_{semester_type}_{year}.csv"
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], file_name)
-        file.save(file_path)
-        df.to_csv(file_path, index=False, sep=";")
+        count_rows(main_data)
 
-        # Convert DataFrame back to CSV
-        csv_data = df.to_csv(index=False, sep=";").encode()
+        entry, _ = store_semester(year, semester_type, semester_data, main_data, storage.encode_semester(student_totals))
+        db.session.commit()
 
-        # Check if an entry for this specific semester already exists
-        existing_entry = AttendanceFile.query.filter_by(year=year, semester_type=semester_type).first()
+        # Drop the parsed copy of the semester that was just replaced
+        semester_cache().invalidate(year, semester_type)
 
-        if existing_entry:
-            existing_entry.csv_file = csv_data  # Replace existing file
-        else:
-            new_entry = AttendanceFile(year=year, semester_type=semester_type, csv_file=csv_data) # New entry
-            db.session.add(new_entry)
-        
-        db.session.commit()
+        # Replaces the semester loaded in this session
+        current_workspace().put('main_data', main_data, f"main_data_{semester_type}_{year}.csv", entry.id, entry.content_hash)
 
         # Indicate success
         return jsonify({'fileSemesterType': semester_type, 'fileYear': year,'success': 'File uploaded and stored successfully'})
@@ -177,7 +555,7 @@ def find_semester_period(month):
     else:
         return 1, 2
 
-@app.route('/upload_bbs', methods=['POST'])
+@bp.route('/upload_bbs', methods=['POST'])
 def upload_bbs():
     if 'file' not in request.files:
         return jsonify({'error': 'No file uploaded'})
@@ -209,44 +587,19 @@ def upload_bbs():
         # Find the semester and period from the month
         semester, period = find_semester_period(month)
 
-        # Load the CSV into a pandas DataFrame
-        df = pd.read_csv(file, delimiter=";", encoding="Windows-1252")
-
-        # Filter desired columns
-        filtered_columns = ["EXTERNAL SYSTEM ID", "BINUSIAN ID", "FULL NAME", "SEX", "CAMPUS", "ACAD PROG", "ACAD PLAN DESCR", 
-                            "PROG STATUS", "ADMIT TERM", "INTAKE PDPT (Semester Awal)", "STUDENT TYPE", "TOTAL SCU (LAST TERM#)"]
-        
+        # Format the upload in chunks
+        try:
+            with phase('decode'):
+                bbs_data = ingest.ingest_bbs(file)
+        except ValueError as e:
+            return jsonify({'error': str(e)})
 
-        df_filtered = df[filtered_columns]
+        count_rows(bbs_data)
 
-        # Renaming columns
-        df_filtered.columns = ["EXTERNAL SYSTEM ID", "BINUSIAN ID", "FULL NAME", "GENDER", "CAMPUS", "ACAD PROG", "ACAD PLAN", 
-                               "PROG STATUS", "ADMIT TERM", "INTAKE PDPT", "STUDENT TYPE", "TOTAL SCU (LAST TERM)"]
-        
-        # Remove settingswithcopy warning
-        df_filtered = df_filtered.copy()
-
-        # Formatting values
-        df_filtered.loc[:, "ADMIT TERM"] = df_filtered["ADMIT TERM"].apply(binus_period_formatter)
-        df_filtered.loc[:, "INTAKE PDPT"] = df_filtered["INTAKE PDPT"].apply(pdpt_semester_formatter).astype(str)
-        df_filtered.loc[:, "STUDENT TYPE"] = df_filtered['STUDENT TYPE'].apply(student_type_capitalization)
-        df_filtered["TOTAL SCU (LAST TERM)"] = df_filtered["TOTAL SCU (LAST TERM)"].apply(
-            lambda x: str(int(x)) if pd.notna(x) else "-"
-        )
-
-        # Only AC and LA are needed
-        df_filtered = df_filtered[(df_filtered["PROG STATUS"] == 'AC') | (df_filtered["PROG STATUS"] == 'LA')]
-
-        # Remove old files 
-        old_files = glob.glob(os.path.join(app.config['UPLOAD_FOLDER'], "bbs_data_*.csv"))
-        for old_file in old_files:
-            os.remove(old_file)
-
-        # Save the uploaded CSV file locally for this instance
-        file_name = f"bbs_data_{year}_{semester}_{period}.csv"
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], file_name)
-        file.save(file_path)
-        df_filtered.to_csv(file_path, index=False, sep=";")
+        # Replaces the BBS list of this session and everything calculated from the old one
+        workspace = current_workspace()
+        workspace.remove(*BBS_FRAMES)
+        workspace.put('bbs_data', bbs_data, f"bbs_data_{year}_{semester}_{period}.csv")
 
         # Indicate success
         return jsonify({'filePeriod': period, 'fileSemester': semester, 'fileYear': year,'success': 'File uploaded and stored successfully'})
@@ -254,37 +607,7 @@ def upload_bbs():
     else:
         return jsonify({'error': 'Invalid file format'})
 
-def binus_period_formatter(val):
-    # Empty cells
-    if pd.isna(val):
-        return "-"
-    
-    # Else,turn it into year.semesterperiod
-    # Change to string
-    val_str = str(int(val))
-    return f"{val_str[:-2]}.{val_str[-2:]}"
-
-def pdpt_semester_formatter(val):
-    # Empty cells
-    if pd.isna(val):
-        return "-"
-    
-    # Else, turn it into year.semester0
-    # Change to string
-    val_str = str(int(val))
-    return f"{str(int(val_str[2:4]))}.{val_str[-1]}0"
-
-def student_type_capitalization(val):
-    if val == 'regular':
-        return 'Regular'
-    elif val == 'master_track':
-        return 'Master track'
-    elif val == 'fast_track':
-        return 'Fast track'
-    else:
-        return 'RPL'
-
-@app.route('/retrieve', methods=['POST'])
+@bp.route('/retrieve', methods=['POST'])
 def retrieve_file():
     data = request.get_json()
     year = data.get('year')
@@ -299,37 +622,41 @@ def retrieve_file():
     if not entry:
         return jsonify({'error': 'No data found for the selected semester and year.'})
 
-    # Convert the stored BLOB back to a CSV file, save it in local storage
-    file_name = f"main_data_{entry.semester_type}_{entry.year}.csv"
-    file_path = os.path.join(app.config['UPLOAD_FOLDER'], file_name)
+    # Load the stored semester into this session's workspace
+    current_workspace().put('main_data', load_semester(entry), f"main_data_{entry.semester_type}_{entry.year}.csv", entry.id, entry.content_hash)
 
-    old_files = glob.glob(os.path.join(app.config['UPLOAD_FOLDER'], "main_data_*.csv"))
-    for old_file in old_files:
-        os.remove(old_file)
+    return jsonify({'fileSemesterType': entry.semester_type, 'fileYear': entry.year, 'success': 'File retrieved and saved locally.'})
 
-    with open(file_path, 'wb') as f:
-        f.write(entry.csv_file)  # Write kthe binary data to a file
 
-    return jsonify({'fileSemesterType': entry.semester_type, 'fileYear': entry.year, 'success': 'File retrieved and saved locally.'})
+@bp.route('/semester_cache_stats', methods=['GET'])
+def semester_cache_stats():
+    return jsonify(semester_cache().stats())
 
+@bp.route('/response_cache_stats', methods=['GET'])
+def response_cache_stats():
+    return jsonify(response_cache().stats())
 
-@app.route('/get_dataframe', methods=['POST'])
+@bp.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(expose(), mimetype='text/plain; version=0.0.4')
+
+@bp.route('/workspace_stats', methods=['GET'])
+def workspace_stats():
+    return jsonify(workspaces().stats())
+
+@bp.route('/get_dataframe', methods=['POST'])
 def get_dataframe():
-    data = request.get_json()
+    data = tables.datatables_params(request)
     filter_exl = data.get('filterEXL')
 
-    files = glob.glob(os.path.join(app.config['UPLOAD_FOLDER'], "main_data_*.csv"))
+    # Filter to show only the desired columns, the other columns of the stored frame aren't loaded
+    filtered_columns = ["NIM", "NAME", "MAJOR", "COURSE NAME", "COMPONENT", "SKS", "TOTAL SESSION", "SESSION DONE", "TOTAL ABSENCE", "MAX ABSENCE"]
+
+    df = current_workspace().get('main_data', columns=filtered_columns)
 
-    if len(files) == 0:
+    if df is None:
         return jsonify({'error': 'No data found'})
-    elif len(files) > 1:
-        return jsonify({'error': 'Multiple files found in folder'})
     else:
-        df = pd.read_csv(files[0], delimiter=";", encoding="Windows-1252")
-
-        # Filter to show only the desired columns
-        filtered_columns = ["NIM", "NAME", "MAJOR", "COURSE NAME", "COMPONENT", "SKS", "TOTAL SESSION", "SESSION DONE", "TOTAL ABSENCE", "MAX ABSENCE"]
-
         if set(filtered_columns).issubset(df.columns):
             # Filter the DataFrame to only include the specific columns
             df_filtered = df[filtered_columns]
@@ -337,262 +664,164 @@ def get_dataframe():
             if filter_exl:
                 df_filtered = df_filtered[df_filtered['COMPONENT'] != 'EXL']
 
-            # Convert filtered DataFrame to HTML for display
-            df_html = df_filtered.to_html(classes='table table-striped', index=False)
+            # Only send the visible page to a serverSide DataTable
+            if tables.is_server_side_request(data):
+                return jsonify(tables.datatables_page(df_filtered, data))
 
-            return jsonify({'data': df_html})
+            # Whole filtered DataFrame, as HTML or as columns (format=columnar)
+            return tables.table_response(df_filtered, data)
         else:
             return jsonify({'error': 'Required columns are missing from the CSV file'})
         
-@app.route('/get_bbs', methods=['POST'])
+@bp.route('/get_bbs', methods=['POST'])
 def get_bbs():
-    # Placeholder name
-    all_files = glob.glob(os.path.join(app.config['UPLOAD_FOLDER'], "bbs_data_*.csv"))
+    params = tables.datatables_params(request)
 
-    # Regex check to filter only the main data
-    pattern = re.compile(r"bbs_data_[0-9].*\.csv$")
-    files = [f for f in all_files if pattern.search(os.path.basename(f))]
+    def render(df):
+        # Show terms as text
+        df = terms.format_term_columns(df)
 
-    if len(files) == 0:
-        return jsonify({'error': 'No data found'})
-    elif len(files) > 1:
-        return jsonify({'error': 'Multiple files found in folder'})
-    else:
-        df = pd.read_csv(files[0], delimiter=";", encoding="Windows-1252")
-
-        df_html = df.to_html(classes='table table-striped', index=False)
-    
-    return jsonify({'data': df_html})
+        # Only send the visible page to a serverSide DataTable
+        if tables.is_server_side_request(params):
+            return jsonify(tables.datatables_page(df, params))
 
+        return tables.table_response(df, params)
 
-@app.route('/get_nim_aggregate', methods=['GET'])
-def get_nim_aggregate():
-    file_path = os.path.join(app.config['UPLOAD_FOLDER'], 'nim_aggregate.csv')
-    if os.path.exists(file_path):
-        df = pd.read_csv(file_path, delimiter=";", encoding="Windows-1252")
-        df_html = df.to_html(classes='table table-striped', index=False)
-        return jsonify({'data': df_html})
-    else:
-        return jsonify({'error': 'No NIM Aggregate DataFrame available'})
-
-@app.route('/aggregate_tables', methods=['POST'])
-def aggregate_tables():
-    files = glob.glob(os.path.join(app.config['UPLOAD_FOLDER'], "main_data_*.csv"))
-
-    if len(files) == 0:
+    response = table_view('bbs_data', params, render)
+    if response is None:
         return jsonify({'error': 'No data found'})
-    elif len(files) > 1:
-        return jsonify({'error': 'Multiple files found in folder'})
-    else:
-        try:
-            df = pd.read_csv(files[0], delimiter=";", encoding="Windows-1252")
-
-            # Create a column for total present
-            df['TOTAL PRESENT'] = df['SESSION DONE'] - df['TOTAL ABSENCE']
-
-            # Calculate attendance so far and semester attendance
-            df['PERCENTAGE_ATTENDANCE'] = (df['TOTAL PRESENT'] / df['SESSION DONE']) * 100
-            df['PERCENTAGE_ATTENDANCE_SEMESTER'] = (df['TOTAL PRESENT'] / df['TOTAL SESSION']) * 100
-
-             # Calculate projected percentage attendance (assume all sessions that have yet to happen to be present)
-            df['PROJECTED_ATTENDANCE_SEMESTER'] = (
-                1 - 
-                (df['TOTAL ABSENCE'] / 
-                df['TOTAL SESSION'])
-            ) * 100
-            
-            # Format percentages
-            df[['PERCENTAGE_ATTENDANCE', 'PERCENTAGE_ATTENDANCE_SEMESTER', 'PROJECTED_ATTENDANCE_SEMESTER']] = df[
-                ['PERCENTAGE_ATTENDANCE', 'PERCENTAGE_ATTENDANCE_SEMESTER', 'PROJECTED_ATTENDANCE_SEMESTER']
-            ].round(2)
-
-            df['ELIGIBLE'] = df['TOTAL ABSENCE'] <= df['MAX ABSENCE']
+    return response
 
-            # Identify courses that have both LEC and LAB, where lec_lab_courses is a list of course codes with both LEC and LAB
-            lec_lab_courses = df[df['COMPONENT'].isin(['LEC', 'LAB'])].groupby('COURSE CODE')['COMPONENT'].nunique()
-            lec_lab_courses = lec_lab_courses[lec_lab_courses > 1].index.tolist()
 
-            # Find students who failed either LEC or LAB for one of those courses
-            failed_students = df[
-                (df['COURSE CODE'].isin(lec_lab_courses)) &
-                (df['COMPONENT'].isin(['LEC', 'LAB'])) & 
-                (df['ELIGIBLE'] == False)
-            ][['NIM', 'COURSE CODE']]
-
-            # Find all rows where the eligible column needs to be set to false, based on the failed students
-            failed_rows = (
-                df.set_index(['NIM', 'COURSE CODE']).index.isin(
-                    failed_students.set_index(['NIM', 'COURSE CODE']).index
-                ) &
-                (df['COMPONENT'].isin(['LEC', 'LAB']))  
-            )
-
-            # A new, temporary column to track indirect fails
-            df['INDIRECT FAIL'] = False
-
-            # Find all rows that will be indirect fails
-            df.loc[failed_rows & (df['ELIGIBLE'] == True), 'INDIRECT FAIL'] = True  
-
-            # Set all eligible to false for failed rows
-            df.loc[failed_rows, 'ELIGIBLE'] = False
-
-            # Drop columns
-            df.drop(columns=['ACAD CAREER', 'STRM', 'BINUSIAN ID', 'TOTAL ABSENCE', 'MAX ABSENCE', 'SKS'], inplace=True)
+@bp.route('/get_nim_aggregate', methods=['GET'])
+def get_nim_aggregate():
+    params = tables.datatables_params(request)
 
-            # Rename columns
-            df.columns = ['NIM', 'NAME', 'MAJOR', 'COURSE CODE', 'COURSE NAME', 'CLASS', 'COMPONENT', 'TOTAL SEMESTER SESSIONS', 'SESSIONS DONE', 'TOTAL PRESENT', 'ATTENDANCE %', 'ATTENDANCE SEMESTER %', 'PROJECTED ATTENDANCE SEMESTER %', 'ELIGIBLE', 'INDIRECT FAIL']
+    def render(df):
+        # Only send the visible page to a serverSide DataTable
+        if tables.is_server_side_request(params):
+            return jsonify(tables.datatables_page(df, params))
 
-            # Save the aggregated DataFrame
-            aggregated_file_path = os.path.join(app.config['UPLOAD_FOLDER'], 'nim_course_aggregate.csv')
-            df.to_csv(aggregated_file_path, index=False, sep=";")
+        return tables.table_response(df, params)
 
-            # Further processing for NIM table
-            # Find number of unique course codes for each student
-            enrolled_courses = df.groupby('NIM')['COURSE CODE'].nunique().reset_index()
-            enrolled_courses.columns = ['NIM', 'NUMBER OF ENROLLED COURSES']
+    response = table_view('nim_aggregate', params, render)
+    if response is None:
+        return jsonify({'error': 'No NIM Aggregate DataFrame available'})
+    return response
 
-            # Find number of failed courses with unique course codes
-            failed_courses = df[df['ELIGIBLE'] == False].groupby('NIM')['COURSE CODE'].nunique().reset_index()
-            failed_courses.columns = ['NIM', 'NUMBER OF FAILED COURSES']
+@bp.route('/aggregate_tables', methods=['POST'])
+def aggregate_tables():
+    workspace = current_workspace()
+    main_data = workspace.get('main_data')
 
-            # Merge results to create a NIM, number of enrolled courses, and number of failed courses table
-            grouped_nim = enrolled_courses.merge(failed_courses, on='NIM', how='left').fillna(0)
+    if main_data is None:
+        return jsonify({'error': 'No data found'})
+    else:
+        semester_id = workspace.source('main_data')
+        source_hash = workspace.source_hash('main_data')
+
+        # Stored tables belong to the semester as it is stored now, another session may have uploaded a newer snapshot
+        # since this session loaded it. Tables of an older snapshot are calculated but neither reused nor stored.
+        def is_current():
+            return source_hash is not None and db.session.query(AttendanceFile.content_hash).filter_by(id=semester_id).scalar() == source_hash
+
+        # Tables calculated or patched before for this version of the semester
+        stored_tables = load_semester_tables(semester_id, source_hash) if is_current() else None
+        if stored_tables is not None:
+            workspace.put('nim_course_aggregate', stored_tables[0])
+            workspace.put('nim_aggregate', stored_tables[1])
+            return jsonify({'success': 'Aggregation completed'})
 
-            # fillna forces column into float, so converting back to int
-            grouped_nim['NUMBER OF FAILED COURSES'] = grouped_nim['NUMBER OF FAILED COURSES'].astype(int)
+        flask_app = current_app._get_current_object()
 
-            # Calculate the percentage of failed courses
-            grouped_nim['PERCENTAGE OF FAILED COURSES'] = round(((grouped_nim['NUMBER OF FAILED COURSES'] / grouped_nim['NUMBER OF ENROLLED COURSES']) * 100), 2)
+        def handoff(result):
+            with handoff_context(flask_app):
+                workspace.put('nim_course_aggregate', result[0])
+                workspace.put('nim_aggregate', result[1])
 
-            # Merge grouped_nim with NAME and MAJOR columns
-            grouped_nim = df[['NIM', 'NAME', 'MAJOR']].drop_duplicates().merge(grouped_nim, on='NIM', how='left')
+                # Checked again, the semester may have been replaced while the tables were calculated
+                if is_current():
+                    store_semester_tables(semester_id, source_hash, storage.encode_semester(result[0]), storage.encode_semester(result[1]))
+                    db.session.commit()
 
-            # Reorder columns
-            grouped_nim.columns = ['NIM', 'NAME', 'MAJOR', 'NUMBER OF ENROLLED COURSES', 'NUMBER OF FAILED COURSES', 'PERCENTAGE OF FAILED COURSES']
+        # Large semesters can be aggregated in the background, the get_ readers pick up the tables once the job is done
+        if run_in_background():
+            job_id = job_manager().submit(workspace.id, 'aggregate_tables', aggregation.aggregate_tables_job, [main_data], handoff)
+            return jsonify({'jobId': job_id})
 
-            # Save the GROUPBY NIM table
-            nim_aggregated_file_path = os.path.join(app.config['UPLOAD_FOLDER'], 'nim_aggregate.csv')
-            grouped_nim.to_csv(nim_aggregated_file_path, index=False, sep=";")
+        try:
+            handoff(aggregation.aggregate_tables_job(no_progress, main_data))
 
             return jsonify({'success': 'Aggregation completed'})
         except Exception as e:
             return jsonify({'error': str(e)})
 
-@app.route('/get_nim_course_aggregate', methods=['POST'])
+@bp.route('/get_nim_course_aggregate', methods=['POST'])
 def get_nim_course_aggregate():
-    data = request.get_json()
+    data = tables.datatables_params(request)
     filter_exl = data.get('filterEXL')
-    file_path = os.path.join(app.config['UPLOAD_FOLDER'], 'nim_course_aggregate.csv')
-    if os.path.exists(file_path):
-        df = pd.read_csv(file_path, delimiter=";", encoding="Windows-1252")
+
+    def render(df):
         if filter_exl:
             df = df[df['COMPONENT'] != 'EXL']
-        df_html = df.to_html(classes='table table-striped', index=False)
-        return jsonify({'data': df_html})
-    else:
+
+        # Only send the visible page to a serverSide DataTable
+        if tables.is_server_side_request(data):
+            return jsonify(tables.datatables_page(df, data))
+
+        return tables.table_response(df, data)
+
+    response = table_view('nim_course_aggregate', data, render)
+    if response is None:
         return jsonify({'error': 'No NIM Course Aggregate DataFrame available'})
+    return response
     
-@app.route('/calculate_extended_columns', methods=['POST'])
+@bp.route('/calculate_extended_columns', methods=['POST'])
 def calculate_extended_columns():
-    all_files = glob.glob(os.path.join(app.config['UPLOAD_FOLDER'], "bbs_data_*.csv"))
-
-    # Regex check to filter only the main data
-    pattern = re.compile(r"bbs_data_[0-9].*\.csv$")
-    files = [f for f in all_files if pattern.search(os.path.basename(f))]
+    workspace = current_workspace()
+    bbs_data = workspace.get('bbs_data')
 
-    if len(files) == 0:
+    if bbs_data is None:
         return jsonify({'error': 'No data found'})
-    elif len(files) > 1:
-        return jsonify({'error': 'Multiple files found in folder'})
     else:
-        try:
-            df = pd.read_csv(files[0], delimiter=";", encoding="Windows-1252")
-
-            # Calculate the max study period for no extensions
-            df['BASE MAX STUDY PERIOD'] = df['ADMIT TERM'].apply(add_3_years)
-            df['BASE MAX STUDY PERIOD (PDPT)'] = df['INTAKE PDPT'].apply(add_3_years)
+        flask_app = current_app._get_current_object()
 
-            # Calculate the max study period for 1 extension
-            df['MAX STUDY PERIOD 1 EXTEND'] = df['BASE MAX STUDY PERIOD'].apply(add_1_semester)
-            df['MAX STUDY PERIOD 1 EXTEND (PDPT)'] = df['BASE MAX STUDY PERIOD (PDPT)'].apply(add_1_semester)
+        def handoff(result):
+            with handoff_context(flask_app):
+                workspace.put('bbs_data_extended', result)
 
-            # Calculate the max study period for 2 extensions
-            df['MAX STUDY PERIOD 2 EXTEND'] = df['MAX STUDY PERIOD 1 EXTEND'].apply(add_1_semester)
-            df['MAX STUDY PERIOD 2 EXTEND (PDPT)'] = df['MAX STUDY PERIOD 1 EXTEND (PDPT)'].apply(add_1_semester)
+        # Run in the background if asked to, get_bbs_extended picks up the table once the job is done
+        if run_in_background():
+            job_id = job_manager().submit(workspace.id, 'calculate_extended_columns', study_period.extended_columns_job, [bbs_data], handoff)
+            return jsonify({'jobId': job_id})
 
-            # Save the aggregated DataFrame
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], 'bbs_data_extended.csv')
-            df.to_csv(file_path, index=False, sep=";")
+        try:
+            handoff(study_period.extended_columns_job(no_progress, bbs_data))
 
             return jsonify({'success': 'Calculated completed'})
         except Exception as e:
             return jsonify({'error': str(e)})
 
-def add_3_years(val):
-    # Empty cell
-    if val == "-":
-        return "-"
-    
-    if isinstance(val, float):
-        val = f"{val:.2f}"
-       
-    # Get components
-    values = str(val).split('.')
-
-    # Add 3 years
-    year = int(values[0]) + 3
-    
-    # If period = 2, then decremeent it by 
-    # Any date where period = 2 must be a Binus format date
-    if int(values[1][1]) == 2:
-        return f"{year}.{values[1][0]}1"
-    else:
-        # Otherwise, decrement the semesters/year as needed
-        if int(values[1][0]) == 1:
-            semester = 2
-            year -= 1
-        else:
-            semester = 1
+@bp.route('/get_bbs_extended', methods=['POST'])
+def get_bbs_extended():
+    params = tables.datatables_params(request)
 
-    # For PDPT dates
-    if int(values[1][1]) == 0:
-        return f"{year}.{semester}0"
-    else:
-        # If period wasn't 2, then it was 1, meaning it should now be 2
-        return f"{year}.{semester}2"
+    def render(df):
+        # Show terms as text
+        df = terms.format_term_columns(df)
 
-def add_1_semester(val):
-    # Empty cell
-    if val == "-":
-        return "-"
-    
-    if isinstance(val, float):
-        val = f"{val:.2f}"
-
-    # Get components
-    values = val.split('.')
-    year = int(values[0])
-    if int(values[1][0]) == 1:
-        semester = 2
-    else: 
-        semester = 1
-        year += 1
-    
-    return f"{year}.{semester}{values[1][1]}"
-   
+        # Only send the visible page to a serverSide DataTable
+        if tables.is_server_side_request(params):
+            return jsonify(tables.datatables_page(df, params))
 
+        return tables.table_response(df, params)
 
-@app.route('/get_bbs_extended', methods=['POST'])
-def get_bbs_extended():
-    file_path = os.path.join(app.config['UPLOAD_FOLDER'], 'bbs_data_extended.csv')
-    if os.path.exists(file_path):
-        df = pd.read_csv(file_path, delimiter=";", encoding="Windows-1252")
-        df_html = df.to_html(classes='table table-striped', index=False)
-        return jsonify({'data': df_html})
-    else:
+    response = table_view('bbs_data_extended', params, render)
+    if response is None:
         return jsonify({'error': 'No BBS Extended Dataframe available'})
+    return response
 
-@app.route('/calculate_student_list', methods=['POST'])
+@bp.route('/calculate_student_list', methods=['POST'])
 def get_student_list_for_extend():
     # Get data and get year, semester, and period
     data = request.get_json()
@@ -600,194 +829,97 @@ def get_student_list_for_extend():
     semester = data.get('semester')
     period = data.get('period')
 
-    # Construct the string to compare with max study period
-    string_to_match = float(f"{year}.{semester}{period}")
-    string_to_match_pdpt = f"{year}.{semester}0"
-
-    files = glob.glob(os.path.join(app.config['UPLOAD_FOLDER'], "bbs_data_extended.csv"))
+    workspace = current_workspace()
+    bbs_extended = workspace.get('bbs_data_extended')
 
-    if len(files) == 0:
+    if bbs_extended is None:
         return jsonify({'error': 'No data found'})
-    elif len(files) > 1:
-        return jsonify({'error': 'Multiple files found in folder'})
     else:
+        flask_app = current_app._get_current_object()
+
+        def handoff(result):
+            with handoff_context(flask_app):
+                workspace.put('bbs_data_student_list', result)
+
+        # Run in the background if asked to, get_bbs_student_list picks up the table once the job is done
+        if run_in_background():
+            job_id = job_manager().submit(workspace.id, 'calculate_student_list', study_period.student_list_job, [year, semester, period, bbs_extended], handoff)
+            return jsonify({'jobId': job_id})
+
         try:
-            df = pd.read_csv(files[0], delimiter=";", encoding="Windows-1252")
-
-            # Filter out unimportant columns
-            df_trimmed = df[['EXTERNAL SYSTEM ID', 'BINUSIAN ID', 'FULL NAME', 'ACAD PROG', 'PROG STATUS', 
-                             'ADMIT TERM', 'INTAKE PDPT', 'STUDENT TYPE','TOTAL SCU (LAST TERM)', 
-                             'BASE MAX STUDY PERIOD', 'BASE MAX STUDY PERIOD (PDPT)', 
-                             'MAX STUDY PERIOD 1 EXTEND', 'MAX STUDY PERIOD 1 EXTEND (PDPT)',
-                             'MAX STUDY PERIOD 2 EXTEND', 'MAX STUDY PERIOD 2 EXTEND (PDPT)']]
-            
-            # Get series of all SCU, but convert to numeric by replacing "-" with NaN
-            scu_numeric = pd.to_numeric(df_trimmed['TOTAL SCU (LAST TERM)'].replace("-", np.nan), errors='coerce')
-
-            # Boolean to check rows that has PDPT and rows with LA students
-            has_pdpt = df_trimmed['INTAKE PDPT'] != "-"
-            is_la = df_trimmed['PROG STATUS'] == 'LA'
-
-            # Getting the specific period of their admit term
-            intake_periods = df_trimmed['ADMIT TERM'].astype(str).str[-1].astype(int)
-
-
-            # Create a series to determine how much each value needs to be deducted, which is the missed potential SCU
-            deduction_conditions = [
-                (has_pdpt) & (is_la) & (scu_numeric < 42) & (period == 1),
-                (has_pdpt) & (is_la) & (scu_numeric < 42) & (period == 2),
-                (~has_pdpt) & (is_la) & (scu_numeric < 42) & (abs(intake_periods - period) == 1),
-                (~has_pdpt) & (is_la) & (scu_numeric < 42) & (abs(intake_periods - period) == 0)
-            ]
-
-            deduction_values = [16, 8, 8, 16]
-
-            # Apply deductions
-            deductions = np.select(deduction_conditions, deduction_values, default=0)
-
-            # New series with deducted SCUs
-            scu_deducted = scu_numeric - deductions
-
-            # Aliases to shorten the upcoming conditions
-            pdpt_0 = df_trimmed['BASE MAX STUDY PERIOD (PDPT)']
-            pdpt_1 = df_trimmed['MAX STUDY PERIOD 1 EXTEND (PDPT)']
-            pdpt_2 = df_trimmed['MAX STUDY PERIOD 2 EXTEND (PDPT)']
-            base_0 = df_trimmed['BASE MAX STUDY PERIOD']
-            base_1 = df_trimmed['MAX STUDY PERIOD 1 EXTEND']
-            base_2 = df_trimmed['MAX STUDY PERIOD 2 EXTEND']
-            is_period_1 = (period == 1)
-            is_period_2 = (period == 2)
-        
-            all_conditions = [
-                # PDPT conditions
-                # Student with more than 42 SCU, and have PDPT
-                (has_pdpt) & (scu_deducted >= 42) & ((pdpt_0 == string_to_match_pdpt) | (pdpt_1 == string_to_match_pdpt) | (pdpt_2 == string_to_match_pdpt)),
-                # Base PDPT is the current period, the current period is 1, and SCU < -6
-                (has_pdpt) & (pdpt_0 == string_to_match_pdpt) & (is_period_1) & (scu_deducted < -6),
-                # Base PDPT is the current period, the current period is 2, and SCU < 2
-                (has_pdpt) & (pdpt_0 == string_to_match_pdpt) & (is_period_2) & (scu_deducted < 2),
-                # Base PDPT is the current period
-                (has_pdpt) & (pdpt_0 == string_to_match_pdpt),
-
-                # 1 Extend PDPT is the current period, the current period is 1, and SCU < 10
-                (has_pdpt) & (pdpt_1 == string_to_match_pdpt) & (is_period_1) * (scu_deducted < 10),
-                # 1 Extend PDPT is the current period, the current period is 2, and SCU < 18
-                (has_pdpt) & (pdpt_1 == string_to_match_pdpt) & (is_period_2) * (scu_deducted < 18),
-                # 1 Extend PDPT is the current period
-                (has_pdpt) & (pdpt_1 == string_to_match_pdpt),
-
-                # 2 Extend PDPT is the current period, the current period is 1, and SCU < 26
-                (has_pdpt) & (pdpt_2 == string_to_match_pdpt) & (is_period_1) & (scu_deducted < 26),
-                # 2 Extend PDPT is the current period, the current period is 2, and SCU < 34
-                (has_pdpt) & (pdpt_2 == string_to_match_pdpt) & (is_period_2) & (scu_deducted < 34),
-                # 2 Extend PDPT is the current period
-                (has_pdpt) & (pdpt_2 == string_to_match_pdpt),
-
-                # BINUS conditions
-                # Student with more than 42 SCU, but no PDPT
-                (~has_pdpt) & (scu_deducted >= 42) & ((base_0 == string_to_match) | (base_1 == string_to_match) | (base_2 == string_to_match)),
-                # Base is the current period, and SCU < 2
-                (~has_pdpt) & (base_0 == string_to_match) & (scu_deducted < 2),
-                # Base is the current period
-                (~has_pdpt) & (base_0 == string_to_match),
-
-                # 1 Extend is the current period, and scu < 18
-                (~has_pdpt) & (base_1 == string_to_match) & (scu_deducted < 18),
-                # 1 Extend is the current period
-                (~has_pdpt) & (base_1 == string_to_match),
-
-                # 2 Extend is the current period, and scu < 34
-                (~has_pdpt) & (base_2 == string_to_match) & (scu_deducted < 34),
-                # 2 Extend is the current period
-                (~has_pdpt) & (base_2 == string_to_match)
-            ]
-            
-            all_actions = [
-                'Confirm with operation (PDPT)',
-                'Recommend for resignation',
-                'Recommend for resignation',
-                '1st Extension',
-                'Recommend for resignation',
-                'Recommend for resignation',
-                '2nd Extension',
-                'Add to DO list',
-                'Add to DO list',
-                'DO depends on SCU in this period',
-                'Confirm with operation (No PDPT)',
-                'Recommend for resignation (confirm with operation)',
-                '1st Extension (confirm with operation)',
-                'Recommend for resignation (confirm with operation)',
-                '2nd Extension (confirm with operation)',
-                'Add to DO list (confirm with operation)',
-                'DO depends on SCU in this period (confirm with operation)'
-            ]
-
-            # To remove settingwithcopy warning
-            df_trimmed = df_trimmed.copy()
-
-            # Populate ACTION column
-            df_trimmed.loc[:, 'ACTION'] = np.select(all_conditions, all_actions, default=None)
-
-            df_filtered = df_trimmed[df_trimmed['ACTION'].notna()]
-
-            # To remove settingwithcopy warning
-            df_filtered = df_filtered.copy()
-            
-            # Force PDPT columns back to strings
-            pdpt_columns = ['INTAKE PDPT', 'BASE MAX STUDY PERIOD (PDPT)', 'MAX STUDY PERIOD 1 EXTEND (PDPT)', 'MAX STUDY PERIOD 2 EXTEND (PDPT)']
-            
-            df_filtered[pdpt_columns] = df_filtered[pdpt_columns].astype(str)
-            
-            # Turning back into 2 decimal place float
-            for column in pdpt_columns:
-                df_filtered.loc[:, column] = df_filtered[column].apply(
-                    lambda x: f"{float(x):.2f}" if x != '-' else x  
-            )
-            
-            # Force back into strings
-            df_filtered[['BASE MAX STUDY PERIOD', 'MAX STUDY PERIOD 1 EXTEND', 'MAX STUDY PERIOD 2 EXTEND']] = \
-                df_filtered[['BASE MAX STUDY PERIOD', 'MAX STUDY PERIOD 1 EXTEND', 'MAX STUDY PERIOD 2 EXTEND']].astype(str)
-            # Save the aggregated DataFrame
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], 'bbs_data_student_list.csv')
-            df_filtered.to_csv(file_path, index=False, sep=";", quoting=csv.QUOTE_NONNUMERIC)
+            handoff(study_period.student_list_job(no_progress, year, semester, period, bbs_extended))
 
             return jsonify({'success': 'Calculated completed'})
         except Exception as e:
             return jsonify({'error': str(e)})
 
-@app.route('/get_bbs_student_list', methods=['POST'])
+@bp.route('/get_bbs_student_list', methods=['POST'])
 def get_bbs_student_list():
-    file_path = os.path.join(app.config['UPLOAD_FOLDER'], 'bbs_data_student_list.csv')
-    if os.path.exists(file_path):
-        pdpt_columns = ['INTAKE PDPT', 'BASE MAX STUDY PERIOD (PDPT)', 'MAX STUDY PERIOD 1 EXTEND (PDPT)', 'MAX STUDY PERIOD 2 EXTEND (PDPT)']
-        df = pd.read_csv(file_path, delimiter=";", encoding="Windows-1252", dtype={col: str for col in pdpt_columns})
-        df_html = df.to_html(classes='table table-striped', index=False)
-        return jsonify({'data': df_html})
-    else:
+    params = tables.datatables_params(request)
+
+    def render(df):
+        # Show terms as text
+        df = terms.format_term_columns(df)
+
+        # Only send the visible page to a serverSide DataTable
+        if tables.is_server_side_request(params):
+            return jsonify(tables.datatables_page(df, params))
+
+        return tables.table_response(df, params)
+
+    response = table_view('bbs_data_student_list', params, render)
+    if response is None:
         return jsonify({'error': 'No BBS Extended Dataframe available'})
+    return response
+
+# Download a table of this session as CSV, XLSX or Parquet, e.g. /export/nim_aggregate?format=xlsx&major=Accounting
+# major and component can be given more than once, rows matching any of the values are kept
+@bp.route('/export/<name>', methods=['GET'])
+def export_frame(name):
+    if name not in EXPORT_FRAMES:
+        return jsonify({'error': 'Unknown table'}), 404
+
+    export_format = request.args.get('format', 'csv')
+    if export_format not in export.EXPORT_FORMATS:
+        return jsonify({'error': 'Unknown export format'}), 400
+
+    df = current_workspace().get(name)
+    if df is None:
+        return jsonify({'error': 'No data found'})
 
-@app.route('/filter_major', methods=['GET'])
+    for filter_name, column in EXPORT_FRAMES[name].items():
+        values = request.args.getlist(filter_name)
+        if values:
+            df = df[df[column].isin(values)]
+
+    try:
+        # Terms are written as text, like the tables on the page
+        chunks = export.export_chunks(df, export_format, terms.format_term_columns)
+    except export.ExportError as e:
+        return jsonify({'error': str(e)}), 400
+
+    mimetype, extension = export.EXPORT_FORMATS[export_format]
+    return Response(chunks, mimetype=mimetype, headers={'Content-Disposition': f'attachment; filename={name}.{extension}'})
+
+@bp.route('/filter_major', methods=['GET'])
 def filter_major():
     major_search_term = request.args.get('major')
 
     if not major_search_term:
         return jsonify({'error': 'No search term provided'}), 400
 
-    file_path = os.path.join(app.config['UPLOAD_FOLDER'], 'uploaded_data.csv')
-
-    if os.path.exists(file_path):
-        df = pd.read_csv(file_path, delimiter=";", encoding="Windows-1252")
+    df = current_workspace().get('uploaded_data')
 
+    if df is not None:
         # Filter the DataFrame by "MAJOR" column, case-insensitive search
         filtered_df = df[df['MAJOR'].str.contains(major_search_term, case=False, na=False)]
 
-        # Convert the filtered DataFrame to HTML
-        df_html = filtered_df.to_html(classes='table table-striped', index=False)
-        return jsonify({'data': df_html})
+        # Whole filtered DataFrame, as HTML or as columns (format=columnar)
+        return tables.table_response(filtered_df, request.args)
     else:
         return jsonify({'error': 'No DataFrame available'})
 
-@app.route('/get_pie_chart_data', methods=['POST'])
+@bp.route('/get_pie_chart_data', methods=['POST'])
 def get_pie_chart_data():
     data = request.get_json()
     year = data.get('year')
@@ -797,23 +929,20 @@ def get_pie_chart_data():
     threshold = data.get('threshold')
     divisor = data.get('divisor')
 
-    # Query database for data of selected seester
-    entry = AttendanceFile.query.filter_by(year=year, semester_type=semester_type).first()
-    if not entry:
+    # Load per student totals of selected semester
+    df = load_semester_aggregate(year, semester_type)
+    if df is None:
         return jsonify({'error': 'No data found for this semester.'})
 
-    # Load CSV
-    df = pd.read_csv(io.BytesIO(entry.csv_file), delimiter=";", encoding="Windows-1252")
-
-    # Only show selected major
-    df = df[df['MAJOR'] == major]
+    # Only show selected major, there is already one row per student
+    df = df[df['MAJOR'] == major].set_index('NIM')
     
     if divisor == 'Present':
         # Calculate attendance percentage
-        attendance = (1 - (df.groupby('NIM')['TOTAL ABSENCE'].sum() / df.groupby('NIM')['SESSION DONE'].sum())) * 100
+        attendance = (1 - (df['TOTAL ABSENCE'] / df['SESSION DONE'])) * 100
     elif divisor == 'Projected':
         # Calculate projected attendance
-        attendance = (1 - (df.groupby('NIM')['TOTAL ABSENCE'].sum() / df.groupby('NIM')['TOTAL SESSION'].sum())) * 100
+        attendance = (1 - (df['TOTAL ABSENCE'] / df['TOTAL SESSION'])) * 100
     else:
         return jsonify({'error': 'Invalid divisor for attendance calculation'})
 
@@ -828,7 +957,7 @@ def get_pie_chart_data():
     elif value == 'Percentage':
         return jsonify({'below_50': round((int(below_threshold) / total * 100), 2), 'above_50': round((int(above_threshold) / total * 100), 2)})
 
-@app.route('/get_bar_chart_major_data', methods=['POST'])
+@bp.route('/get_bar_chart_major_data', methods=['POST'])
 def get_bar_chart_major_data():
     data = request.get_json()
     year = data.get('year')
@@ -838,35 +967,35 @@ def get_bar_chart_major_data():
     threshold = data.get('threshold')
     divisor = data.get('divisor')
 
-    # Query database for data of selected seester
-    entry = AttendanceFile.query.filter_by(year=year, semester_type=semester_type).first()
-    if not entry:
+    # Load per student totals of selected semester
+    df = load_semester_aggregate(year, semester_type)
+    if df is None:
         return jsonify({'error': 'No data found for this semester.'})
 
-    # Load CSV
-    df = pd.read_csv(io.BytesIO(entry.csv_file), delimiter=";", encoding="Windows-1252")
-
     # Only show selected majors
     df = df[df['MAJOR'].isin(majors)]
 
+    # Students listed under more than one selected major are counted over all their rows
+    totals = df.groupby('NIM')[['TOTAL ABSENCE', 'SESSION DONE', 'TOTAL SESSION']].sum()
+
     if divisor == 'Present':
         # Calculate attendance percentage
-        attendance = (1 - (df.groupby('NIM')['TOTAL ABSENCE'].sum() / df.groupby('NIM')['SESSION DONE'].sum())) * 100
+        attendance = (1 - (totals['TOTAL ABSENCE'] / totals['SESSION DONE'])) * 100
     elif divisor == 'Projected':
         # Calculate projected attendance
-        attendance = (1 - (df.groupby('NIM')['TOTAL ABSENCE'].sum() / df.groupby('NIM')['TOTAL SESSION'].sum())) * 100
+        attendance = (1 - (totals['TOTAL ABSENCE'] / totals['TOTAL SESSION'])) * 100
 
     # For all students and their major
-    df_students = df[['NIM', 'MAJOR']].drop_duplicates()  
+    df_students = df[['NIM', 'MAJOR']].copy()
     df_students['Below_threshold'] = df_students['NIM'].map(attendance < threshold)
 
     if value == 'Number':
         # Count num of students under 50% per major
-        results = df_students.groupby('MAJOR')['Below_threshold'].sum().reset_index()
+        results = df_students.groupby('MAJOR', observed=True)['Below_threshold'].sum().reset_index()
     elif value == 'Percentage':
         # Count total students per major and number of students under 50%, then divide
-        students_in_major = df_students.groupby('MAJOR')['NIM'].count()
-        below_threshold_in_major = df_students.groupby('MAJOR')['Below_threshold'].sum()
+        students_in_major = df_students.groupby('MAJOR', observed=True)['NIM'].count()
+        below_threshold_in_major = df_students.groupby('MAJOR', observed=True)['Below_threshold'].sum()
 
         results = (round((below_threshold_in_major / students_in_major * 100), 2)).reset_index()
     
@@ -889,40 +1018,45 @@ def semester_sort(semester):
         "Odd": 1     # Sept - Jan
     }
 
-    # Sort by year first, then semester type
-    return (year, semester_order[semester_type])
+    # Sort by year first, then semester type, as a single integer key
+    return year * 10 + semester_order[semester_type]
 
-@app.route('/get_bar_chart_student_data', methods=['POST'])
+@bp.route('/get_bar_chart_student_data', methods=['POST'])
 def get_bar_chart_student_data():
     data = request.get_json()
     nim = data.get('nim')
     threshold = data.get('threshold')
     divisor = data.get('divisor')
 
-    # Query all tables in the database, one for each semester
-    all_entries = AttendanceFile.query.all()
+    # Find which semesters the student appears in, without loading any semester data
+    index_missing_semesters()
+    student_rows_by_semester = find_student_rows(int(nim))
+
+    # Query all semesters in the database, leaving their data unloaded
+    all_semesters = db.session.query(AttendanceFile.id, AttendanceFile.year, AttendanceFile.semester_type).order_by(AttendanceFile.id).all()
 
     # Dictionary to store results, and variable to store student name
     results = {}
     not_enrolled = []
     student_name = None
 
-    # Loop through all tables
-    for entry in all_entries:
+    # Loop through all semesters
+    for semester in all_semesters:
         # Construct the current entry's semester
-        current_semester = f"{entry.semester_type} {entry.year}"
-
-        # Load CSV
-        df = pd.read_csv(io.BytesIO(entry.csv_file), delimiter=";", encoding="Windows-1252")
-
-        # Only show selected student
-        student_rows = df[df['NIM'] == int(nim)]
+        current_semester = f"{semester.semester_type} {semester.year}"
 
         # If the student isn't in the semester, move on to the next one
-        if student_rows.empty:
+        if semester.id not in student_rows_by_semester:
             results[current_semester] = 0
             not_enrolled.append(current_semester)
             continue  
+
+        # Load only the columns needed for the chart
+        entry = db.session.get(AttendanceFile, semester.id)
+        df = load_semester(entry, columns=['NIM', 'NAME', 'TOTAL ABSENCE', 'MAX ABSENCE', 'SESSION DONE', 'TOTAL SESSION'])
+
+        # Only show selected student
+        student_rows = df.iloc[student_rows_by_semester[semester.id]]
         
         # Get student's name if it doesn't exist
         if student_name is None:
@@ -963,7 +1097,7 @@ def get_bar_chart_student_data():
         return jsonify({"name": student_name, "not_enrolled": not_enrolled, "data": [{"semester": s, "count": c} for s, c in list(results_sorted.items())[-21:]]})
 
 
-@app.route('/get_bar_chart_course_data', methods=['POST'])
+@bp.route('/get_bar_chart_course_data', methods=['POST'])
 def get_bar_chart_course_data():
     data = request.get_json()
     course = data.get('course')
@@ -993,8 +1127,8 @@ def get_bar_chart_course_data():
         # Construct the current entry's semester
         current_semester = f"{entry.semester_type} {entry.year}"
 
-        # Load CSV
-        df = pd.read_csv(io.BytesIO(entry.csv_file), delimiter=";", encoding="Windows-1252")
+        # Load only the columns needed for the chart
+        df = load_semester(entry, columns=['NIM', 'COURSE CODE', 'COURSE NAME', 'COMPONENT', 'TOTAL ABSENCE', 'MAX ABSENCE', 'SESSION DONE', 'TOTAL SESSION'])
 
         # Only show selected course
         course_rows = df[df['COURSE CODE'] == course]
@@ -1107,7 +1241,153 @@ def get_bar_chart_course_data():
 
     return jsonify({"name": course_name, "data": formatted_results})
 
-@app.route('/get_bar_chart_student_course_data', methods=['POST'])
+# Failing and enrolled student counts of every course and component in one semester, using grouped operations
+def course_trend_counts(df, threshold, divisor):
+    if divisor == 'Max':
+        failing = df['TOTAL ABSENCE'] > df['MAX ABSENCE']
+    elif divisor == 'Present':
+        failing = (1 - (df['TOTAL ABSENCE'] / df['SESSION DONE'])) * 100 < threshold
+    elif divisor == 'Projected':
+        failing = (1 - (df['TOTAL ABSENCE'] / df['TOTAL SESSION'])) * 100 < threshold
+
+    # LEC and LAB are counted together, a student failing either one is counted once
+    component = df['COMPONENT'].astype(object)
+    group = component.where(~component.isin(['LEC', 'LAB']), 'LEC/LAB')
+
+    failing_counts = df[failing].groupby(['COURSE CODE', group[failing]], observed=True)['NIM'].nunique()
+    student_counts = df.groupby(['COURSE CODE', 'COMPONENT'], observed=True)['NIM'].nunique()
+
+    return failing_counts.to_dict(), student_counts.to_dict()
+
+# Whether a request parameter is a list of strings, like the course codes or components of a chart
+def is_string_list(value):
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+@bp.route('/get_bar_chart_courses_data', methods=['POST'])
+def get_bar_chart_courses_data():
+    data = request.get_json(silent=True) or {}
+    courses = data.get('courses')
+    major = data.get('major')
+    components = data.get('components')
+    value = data.get('value')
+    semester_count = data.get('semester_count')
+    threshold = data.get('threshold')
+    divisor = data.get('divisor')
+
+    # Bad parameters are answered with 400 and a message for the user
+    if not courses and not major:
+        return jsonify({'error': 'A list of courses or a major is needed.'}), 400
+
+    if courses and not is_string_list(courses):
+        return jsonify({'error': 'Courses must be a list of course codes.'}), 400
+
+    if not components or not is_string_list(components):
+        return jsonify({'error': 'A list of components is needed, for example ["LEC", "LAB"].'}), 400
+
+    if divisor not in ['Max', 'Present', 'Projected']:
+        return jsonify({'error': 'Invalid divisor for attendance calculation'}), 400
+
+    # A copy, LEC/LAB is replaced below
+    components = list(components)
+
+    # If LEC/LAB is picked, query both LEC and LAB
+    if "LEC/LAB" in components:
+        components.remove("LEC/LAB")
+        components.extend(["LEC", "LAB"])
+
+    # The first of LEC and LAB found in a semester gives the number of students for LEC/LAB
+    lec_lab_components = [component for component in components if component in ["LEC", "LAB"]]
+
+    columns = ['NIM', 'COURSE CODE', 'COURSE NAME', 'COMPONENT', 'TOTAL ABSENCE', 'MAX ABSENCE', 'SESSION DONE', 'TOTAL SESSION']
+    if major:
+        columns.append('MAJOR')
+
+    # Query all semesters in the database, leaving their data unloaded
+    all_semesters = db.session.query(AttendanceFile.id, AttendanceFile.year, AttendanceFile.semester_type).order_by(AttendanceFile.id).all()
+
+    # Counts of every semester, course names, and courses that have a LAB
+    semester_counts = {}
+    course_names = {}
+    courses_with_lab = set()
+    major_courses = set()
+
+    # A single pass over each semester for all courses
+    for semester in all_semesters:
+        current_semester = f"{semester.semester_type} {semester.year}"
+
+        entry = db.session.get(AttendanceFile, semester.id)
+        df = load_semester(entry, columns=columns)
+
+        # Courses taken by students of the major
+        if major:
+            major_courses.update(df.loc[df['MAJOR'] == major, 'COURSE CODE'].unique())
+        else:
+            df = df[df['COURSE CODE'].isin(courses)]
+
+        # Only the selected components
+        df = df[df['COMPONENT'].isin(components)]
+
+        for course_code, course_name in df.drop_duplicates('COURSE CODE')[['COURSE CODE', 'COURSE NAME']].itertuples(index=False):
+            course_names.setdefault(course_code, course_name)
+        courses_with_lab.update(df.loc[df['COMPONENT'] == 'LAB', 'COURSE CODE'].unique())
+
+        semester_counts[current_semester] = course_trend_counts(df, threshold, divisor)
+
+    if major:
+        courses = sorted(major_courses)
+
+    # Sorting the semesters in chronological order, limited to semester_count semesters
+    sorted_semesters = sorted(semester_counts.keys(), key=semester_sort)[-int(semester_count):]
+
+    # Converting to percentage of students
+    def count_to_value(failing, students):
+        if value == 'Percentage':
+            return round((failing / students * 100), 2) if students > 0 else 0
+        return failing
+
+    results = {}
+    not_found = []
+
+    for course in courses:
+        if course not in course_names:
+            not_found.append(course)
+            continue
+
+        formatted_results = []
+        for semester in sorted_semesters:
+            failing_counts, student_counts = semester_counts[semester]
+            semester_data = []
+
+            # LEC/LAB, labelled LEC for courses without a LAB
+            if "LEC" in components:
+                students = next((student_counts[(course, component)] for component in lec_lab_components if (course, component) in student_counts), None)
+                semester_data.append({
+                    "component": "LEC/LAB" if course in courses_with_lab else "LEC",
+                    "count": "N/A" if students is None else count_to_value(failing_counts.get((course, "LEC/LAB"), 0), students)
+                })
+
+            # EXL & BLK, N/A when the course doesn't have the component that semester
+            for comp in ["EXL", "BLK"]:
+                if comp in components:
+                    students = student_counts.get((course, comp))
+                    semester_data.append({
+                        "component": comp,
+                        "count": "N/A" if students is None else count_to_value(failing_counts.get((course, comp), 0), students)
+                    })
+
+            formatted_results.append({
+                "semester": semester,
+                "data": semester_data
+            })
+
+        results[course] = {"name": course_names[course], "data": formatted_results}
+
+    if not results:
+        return jsonify({'error': 'Courses not found in any semester.'})
+
+    return jsonify({"courses": results, "not_found": not_found})
+
+@bp.route('/get_bar_chart_student_course_data', methods=['POST'])
 def get_bar_chart_student_course_data():
     data = request.get_json()
     nim = data.get('nim')
@@ -1116,8 +1396,12 @@ def get_bar_chart_student_course_data():
     value = data.get('value')
     max_semesters = data.get('semesters')
 
-    # Query all tables in the database, one for each semester
-    all_entries = AttendanceFile.query.all()
+    # Find which semesters the student took the course in, without loading any semester data
+    index_missing_semesters()
+    course_rows_by_semester = find_student_rows(int(nim), course)
+
+    # Query all semesters in the database, leaving their data unloaded
+    all_semesters = db.session.query(AttendanceFile.id, AttendanceFile.year, AttendanceFile.semester_type).order_by(AttendanceFile.id).all()
 
     # Dictionary to store results, and variable to store student name
     results = {}
@@ -1127,22 +1411,26 @@ def get_bar_chart_student_course_data():
 
     checked_csvs = 0
 
-    # Loop through all tables
-    for entry in all_entries:
+    # Loop through all semesters
+    for semester in all_semesters:
         # Construct the current entry's semester
-        current_semester = f"{entry.semester_type} {entry.year}"
+        current_semester = f"{semester.semester_type} {semester.year}"
 
-        # Load CSV
-        df = pd.read_csv(io.BytesIO(entry.csv_file), delimiter=";", encoding="Windows-1252")
-
-        # Update count of checked CSVs
+        # Update count of checked semesters
         checked_csvs += 1
 
-        # Only show selected student
-        student_rows = df[df['NIM'] == int(nim)]
+        # If the student didn't take the course in the semester, move on to the next one
+        if semester.id not in course_rows_by_semester:
+            results[current_semester] = 0
+            not_enrolled.append(current_semester)
+            continue
 
-        # Only show selected course
-        course_rows = student_rows[student_rows['COURSE CODE'] == course]
+        # Load only the columns needed for the chart
+        entry = db.session.get(AttendanceFile, semester.id)
+        df = load_semester(entry, columns=['NIM', 'NAME', 'COURSE CODE', 'COURSE NAME', 'COMPONENT', 'SESSION DONE', 'TOTAL ABSENCE'])
+
+        # Only show the student's rows for the selected course
+        course_rows = df.iloc[course_rows_by_semester[semester.id]]
 
         # Only show selected component
         course_rows = course_rows[course_rows['COMPONENT'] == component]
@@ -1198,7 +1486,22 @@ def get_bar_chart_student_course_data():
     return jsonify({"course_name": course_name, "student_name": student_name, "not_enrolled": not_enrolled, "data": [{"semester": s, "count": c} for s, c in max_results.items()]})
 
 
+@bp.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    status = job_manager().status(job_id)
+
+    if status is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    return jsonify(status)
+
+@bp.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    if not job_manager().cancel(job_id):
+        return jsonify({'error': 'Job not found or already finished'}), 404
+
+    return jsonify({'success': 'Job cancelled'})
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    init_app(create_app()).run(debug=True)
  
\ No newline at end of file
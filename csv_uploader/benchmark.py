@@ -0,0 +1,466 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import threading
+import statistics
+import tracemalloc
+import numpy as np # type: ignore
+from models import write_dataset, generate_students, generate_attendance, FIRST_NIM
+from schema import ATTENDANCE_SCHEMA, apply_schema
+
+# Benchmark of every route, driven through the Flask test client on generated data
+# Run from anywhere: python csv_uploader/benchmark.py --save-baseline baseline.json
+# and later: python csv_uploader/benchmark.py --baseline baseline.json
+# The app works on a scratch database and upload folder, the real attendance.db is never touched.
+
+# A route is slower or uses more memory than the baseline when it is over by more than this fraction
+DEFAULT_TOLERANCE = 0.25
+
+# Latency changes smaller than this are timer noise, whatever the fraction
+MIN_REGRESSION_MS = 5
+
+# Same for peak memory, routes that hardly allocate anything double their peak over a few kilobytes
+MIN_REGRESSION_MB = 1
+
+# A dashboard read slower than this while an upload is writing counts as stalled
+STALL_SECONDS = 2.0
+
+# A new web process should answer its first request within this time, counted from the start of the interpreter
+STARTUP_TARGET_SECONDS = 1.0
+
+# Runs in a new interpreter for every start: build the app and send it its first requests, like a new web process would
+# Prints the timings as JSON. eager imports the modules that are otherwise loaded by the first request that uses them.
+STARTUP_SCRIPT = '''
+import sys, json, time
+started = float(sys.argv[1])
+eager = sys.argv[2] == 'eager'
+start = time.perf_counter()
+if eager:
+    import storage, schema, tables, ingest, terms, aggregation, study_period, export
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+client = app.test_client()
+first = client.get('/')
+first_response = time.time() - started
+responded = time.perf_counter()
+client.get('/list_uploaded_files')
+print(json.dumps({
+    'ok': first.status_code == 200,
+    'import_ms': (imported - start) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (responded - created) * 1000,
+    'second_request_ms': (time.perf_counter() - responded) * 1000,
+    'first_response_ms': first_response * 1000,
+    'pandas_loaded': 'pandas' in sys.modules
+}))
+'''
+
+# Call a route repeat times, cycling through calls, and record latency, throughput and peak memory
+# Memory is measured in one extra run, tracemalloc slows the calls down too much to time them at the same time
+def measure(calls, repeat):
+    latencies = []
+    errors = 0
+
+    for i in range(repeat):
+        start = time.perf_counter()
+        response = calls[i % len(calls)]()
+        latencies.append(time.perf_counter() - start)
+
+        if response.status_code != 200 or (response.is_json and (response.get_json() or {}).get('error')):
+            errors += 1
+
+    tracemalloc.start()
+    calls[-1]()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        'runs': repeat,
+        'errors': errors,
+        'median_ms': round(statistics.median(latencies) * 1000, 3),
+        'p95_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 3),
+        'min_ms': round(latencies[0] * 1000, 3),
+        'throughput_rps': round(len(latencies) / sum(latencies), 2),
+        'peak_memory_mb': round(peak / (1024 * 1024), 3)
+    }
+
+# The semester year and type the upload route gives the n-th generated semester
+def semester_of(index, first_year):
+    return first_year + index // 2, 'Odd' if index % 2 == 0 else 'Even'
+
+def upload(client, route, path):
+    def call():
+        with open(path, 'rb') as file:
+            return client.post(route, data={'file': (file, os.path.basename(path))}, content_type='multipart/form-data')
+    return call
+
+def post(client, route, payload):
+    return lambda: client.post(route, json=payload)
+
+def get(client, route):
+    return lambda: client.get(route)
+
+# Submit a background job and poll it until it is done
+# Routes answer right away, without a job, when their result is already stored
+def background(client, route, payload):
+    def call():
+        response = client.post(route, json={**payload, 'background': True})
+        job_id = response.get_json().get('jobId')
+        if job_id is None:
+            return response
+        while True:
+            status = client.get(f'/jobs/{job_id}')
+            if status.get_json()['state'] in ('done', 'failed', 'cancelled'):
+                return status
+            time.sleep(0.01)
+    return call
+
+def run_benchmark(client, attendance_paths, bbs_path, first_year, repeat):
+    last_year, last_type = semester_of(len(attendance_paths) - 1, first_year)
+    nim = str(FIRST_NIM + 1)
+    majors = ['Computer Science', 'Fashion', 'Accounting']
+    datatables_page = {'draw': 1, 'start': 0, 'length': 25, 'search': {'value': ''}, 'order': [{'column': 0, 'dir': 'asc'}]}
+
+    # Each case is a name, its calls and how many times to run it, in the order a user would go through the app
+    # Uploads run once per file, they also fill the database for the cases after them
+    cases = [
+        ('GET /', [get(client, '/')], repeat),
+        ('GET /dashboard', [get(client, '/dashboard')], repeat),
+        ('GET /bbs', [get(client, '/bbs')], repeat),
+        ('POST /upload', [upload(client, '/upload', path) for path in attendance_paths], len(attendance_paths)),
+        ('GET /list_uploaded_files', [get(client, '/list_uploaded_files')], repeat),
+        ('POST /retrieve', [post(client, '/retrieve', {'year': last_year, 'semester_type': last_type})], repeat),
+        ('POST /get_dataframe', [post(client, '/get_dataframe', {'filterEXL': True})], repeat),
+        ('POST /get_dataframe (server side)', [post(client, '/get_dataframe', {'filterEXL': True, **datatables_page})], repeat),
+        ('POST /aggregate_tables', [post(client, '/aggregate_tables', {})], repeat),
+        ('POST /aggregate_tables (background)', [background(client, '/aggregate_tables', {})], repeat),
+        # The semester already has aggregate tables now, so uploading it again patches them
+        ('POST /upload (same semester again)', [upload(client, '/upload', attendance_paths[-1])], repeat),
+        ('GET /get_nim_aggregate', [get(client, '/get_nim_aggregate')], repeat),
+        ('POST /get_nim_course_aggregate', [post(client, '/get_nim_course_aggregate', {'filterEXL': False})], repeat),
+        ('POST /get_nim_course_aggregate (columnar)', [post(client, '/get_nim_course_aggregate', {'filterEXL': False, 'format': 'columnar'})], repeat),
+        ('POST /get_nim_course_aggregate (server side)', [post(client, '/get_nim_course_aggregate', {'filterEXL': False, **datatables_page})], repeat),
+        ('GET /filter_major', [get(client, '/filter_major?major=Computer')], repeat),
+        ('POST /get_pie_chart_data', [post(client, '/get_pie_chart_data', {'year': last_year, 'semester_type': last_type, 'value': 'Number', 'major': 'Computer Science', 'threshold': 75, 'divisor': 'Present'})], repeat),
+        ('POST /get_bar_chart_major_data', [post(client, '/get_bar_chart_major_data', {'year': last_year, 'semester_type': last_type, 'value': 'Percentage', 'majors': majors, 'threshold': 75, 'divisor': 'Projected'})], repeat),
+        ('POST /get_bar_chart_student_data', [post(client, '/get_bar_chart_student_data', {'nim': nim, 'threshold': 75, 'divisor': 'Present'})], repeat),
+        ('POST /get_bar_chart_course_data', [post(client, '/get_bar_chart_course_data', {'course': 'COMP6000', 'components': ['LEC/LAB'], 'value': 'Number', 'semester_count': len(attendance_paths), 'threshold': 75, 'divisor': 'Max'})], repeat),
+        ('POST /get_bar_chart_courses_data', [post(client, '/get_bar_chart_courses_data', {'major': 'Computer Science', 'components': ['LEC/LAB', 'EXL', 'BLK'], 'value': 'Percentage', 'semester_count': len(attendance_paths), 'threshold': 75, 'divisor': 'Present'})], repeat),
+        ('POST /get_bar_chart_student_course_data', [post(client, '/get_bar_chart_student_course_data', {'nim': nim, 'course': 'COMP6000', 'component': 'LEC', 'value': 'Percentage', 'semesters': len(attendance_paths)})], repeat),
+        ('GET /semester_cache_stats', [get(client, '/semester_cache_stats')], repeat),
+        ('POST /upload_bbs', [upload(client, '/upload_bbs', bbs_path)], repeat),
+        ('GET /search_bbs_file', [get(client, '/search_bbs_file')], repeat),
+        ('POST /get_bbs', [post(client, '/get_bbs', {})], repeat),
+        ('POST /get_bbs (server side)', [post(client, '/get_bbs', datatables_page)], repeat),
+        ('POST /calculate_extended_columns', [post(client, '/calculate_extended_columns', {})], repeat),
+        ('POST /calculate_extended_columns (background)', [background(client, '/calculate_extended_columns', {})], repeat),
+        ('POST /get_bbs_extended', [post(client, '/get_bbs_extended', {})], repeat),
+        ('POST /calculate_student_list', [post(client, '/calculate_student_list', {'year': last_year % 100, 'semester': 1, 'period': 1})], repeat),
+        ('POST /calculate_student_list (background)', [background(client, '/calculate_student_list', {'year': last_year % 100, 'semester': 1, 'period': 1})], repeat),
+        ('POST /get_bbs_student_list', [post(client, '/get_bbs_student_list', {})], repeat),
+        ('GET /workspace_stats', [get(client, '/workspace_stats')], repeat),
+    ]
+
+    results = {}
+    for name, calls, runs in cases:
+        results[name] = measure(calls, runs)
+        print(f"{name:<50} {results[name]['median_ms']:>10.1f} ms {results[name]['peak_memory_mb']:>9.1f} MB", file=sys.stderr)
+
+    return results
+
+# Latency summary of a list of seconds, in milliseconds
+def latency_summary(latencies):
+    latencies = sorted(latencies)
+    if not latencies:
+        return {'reads': 0}
+    return {
+        'reads': len(latencies),
+        'p50_ms': round(statistics.median(latencies) * 1000, 3),
+        'p95_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 3),
+        'max_ms': round(latencies[-1] * 1000, 3)
+    }
+
+# Dashboard reads from several threads, first on their own and then while another thread uploads semesters again
+# Readers must keep getting answers during the upload instead of waiting for its write to finish
+def run_concurrency(app, attendance_paths, first_year, readers, uploads):
+    last_year, last_type = semester_of(len(attendance_paths) - 1, first_year)
+    payloads = [
+        ('/get_pie_chart_data', {'year': last_year, 'semester_type': last_type, 'value': 'Number', 'major': 'Computer Science', 'threshold': 75, 'divisor': 'Present'}),
+        ('/get_bar_chart_student_data', {'nim': str(FIRST_NIM + 1), 'threshold': 75, 'divisor': 'Present'}),
+        ('/list_uploaded_files', None)
+    ]
+    errors = []
+
+    def read_loop(stop, latencies):
+        # Every reader is its own browser, with its own session
+        client = app.test_client()
+        i = 0
+        while not stop.is_set():
+            route, payload = payloads[i % len(payloads)]
+            start = time.perf_counter()
+            response = client.post(route, json=payload) if payload else client.get(route)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors.append(f"{route}: {response.status_code}")
+            i += 1
+
+    def read_while(work):
+        stop = threading.Event()
+        latencies = [[] for _ in range(readers)]
+        threads = [threading.Thread(target=read_loop, args=(stop, latencies[i])) for i in range(readers)]
+        for thread in threads:
+            thread.start()
+        start = time.perf_counter()
+        work()
+        duration = time.perf_counter() - start
+        stop.set()
+        for thread in threads:
+            thread.join()
+        return latency_summary([latency for thread_latencies in latencies for latency in thread_latencies]), duration
+
+    def upload_all():
+        client = app.test_client()
+        for i in range(uploads):
+            response = upload(client, '/upload', attendance_paths[i % len(attendance_paths)])()
+            if response.status_code != 200:
+                errors.append(f"/upload: {response.status_code}")
+
+    idle, _ = read_while(lambda: time.sleep(2))
+    busy, duration = read_while(upload_all)
+
+    result = {
+        'readers': readers,
+        'uploads': uploads,
+        'upload_seconds': round(duration, 3),
+        'idle': idle,
+        'during_upload': busy,
+        'errors': errors
+    }
+
+    print(f"\nDashboard reads by {readers} threads, {uploads} upload(s) in {duration:.1f} s", file=sys.stderr)
+    for name in ['idle', 'during_upload']:
+        summary = result[name]
+        print(f"{name:<15} {summary['reads']:>6} reads  p50 {summary.get('p50_ms', 0):>8.1f} ms  "
+              f"p95 {summary.get('p95_ms', 0):>8.1f} ms  max {summary.get('max_ms', 0):>8.1f} ms", file=sys.stderr)
+
+    return result
+
+# LEC and LAB indirect fails the way aggregation.py found them before eligibility.py, kept to compare with
+def legacy_indirect_fails(df):
+    df = df.copy()
+    df['ELIGIBLE'] = df['TOTAL ABSENCE'] <= df['MAX ABSENCE']
+
+    lec_lab_courses = df[df['COMPONENT'].isin(['LEC', 'LAB'])].groupby('COURSE CODE', observed=True)['COMPONENT'].nunique()
+    lec_lab_courses = lec_lab_courses[lec_lab_courses > 1].index.tolist()
+
+    failed_students = df[
+        (df['COURSE CODE'].isin(lec_lab_courses)) &
+        (df['COMPONENT'].isin(['LEC', 'LAB'])) &
+        (df['ELIGIBLE'] == False)
+    ][['NIM', 'COURSE CODE']]
+
+    failed_rows = (
+        df.set_index(['NIM', 'COURSE CODE']).index.isin(failed_students.set_index(['NIM', 'COURSE CODE']).index) &
+        (df['COMPONENT'].isin(['LEC', 'LAB']))
+    )
+
+    df['INDIRECT FAIL'] = False
+    df.loc[failed_rows & (df['ELIGIBLE'] == True), 'INDIRECT FAIL'] = True
+    df.loc[failed_rows, 'ELIGIBLE'] = False
+    return df['ELIGIBLE'].to_numpy(), df['INDIRECT FAIL'].to_numpy()
+
+def engine_indirect_fails(df):
+    from eligibility import propagate_eligibility
+    return propagate_eligibility(df, df['TOTAL ABSENCE'] <= df['MAX ABSENCE'])
+
+# Time the eligibility engine against the legacy indirect fail code on one generated semester, both must give the same columns
+def run_eligibility(n_students, n_courses, seed, repeat):
+    df = apply_schema(generate_attendance(generate_students(n_students, seed), n_courses, seed=seed), ATTENDANCE_SCHEMA)
+    results = {}
+
+    for name, implementation in [('legacy', legacy_indirect_fails), ('engine', engine_indirect_fails)]:
+        latencies = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            columns = implementation(df)
+            latencies.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        implementation(df)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        results[name] = {'columns': columns, 'median_ms': round(statistics.median(latencies) * 1000, 3), 'peak_memory_mb': round(peak / (1024 * 1024), 3)}
+
+    same = all(np.array_equal(a, b) for a, b in zip(results['legacy'].pop('columns'), results['engine'].pop('columns')))
+    results['rows'] = len(df)
+    results['same_result'] = same
+    results['speedup'] = round(results['legacy']['median_ms'] / results['engine']['median_ms'], 2)
+
+    print(f"\nIndirect fails of {len(df)} rows: legacy {results['legacy']['median_ms']:.1f} ms "
+          f"{results['legacy']['peak_memory_mb']:.1f} MB, engine {results['engine']['median_ms']:.1f} ms "
+          f"{results['engine']['peak_memory_mb']:.1f} MB, {results['speedup']}x faster, same result: {same}", file=sys.stderr)
+    return results
+
+# Cold starts of the app in new interpreters, with the pandas modules imported lazily (as the app does) and eagerly
+# The database is set up before, so every start finds it ready, like a web process that is added to a running server
+def run_startup(repeat):
+    scratch = tempfile.mkdtemp(prefix='attendance_startup_')
+    source = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(scratch, 'startup.db')}",
+               PYTHONPATH=os.pathsep.join(filter(None, [source, os.environ.get('PYTHONPATH')])))
+
+    def start(mode):
+        output = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT, repr(time.time()), mode],
+                                cwd=scratch, env=env, capture_output=True, text=True, check=True).stdout
+        return json.loads(output.splitlines()[-1])
+
+    start('lazy')
+    results = {}
+    for mode in ['lazy', 'eager']:
+        runs = [start(mode) for _ in range(repeat)]
+        results[mode] = {name: round(statistics.median(run[name] for run in runs), 3)
+                         for name in ['import_ms', 'create_app_ms', 'first_request_ms', 'second_request_ms', 'first_response_ms']}
+        results[mode]['errors'] = sum(not run['ok'] for run in runs)
+        results[mode]['pandas_loaded'] = any(run['pandas_loaded'] for run in runs)
+
+    results['target_ms'] = STARTUP_TARGET_SECONDS * 1000
+
+    print(f"\n{'start':<8} {'import ms':>10} {'create ms':>10} {'1st req ms':>11} {'2nd req ms':>11} {'1st response ms':>16}  pandas", file=sys.stderr)
+    for mode in ['lazy', 'eager']:
+        result = results[mode]
+        print(f"{mode:<8} {result['import_ms']:>10.1f} {result['create_app_ms']:>10.1f} {result['first_request_ms']:>11.1f} "
+              f"{result['second_request_ms']:>11.1f} {result['first_response_ms']:>16.1f}  {'loaded' if result['pandas_loaded'] else 'not loaded'}",
+              file=sys.stderr)
+    return results
+
+# Routes whose median latency or peak memory grew by more than the tolerance
+def compare(results, baseline, tolerance):
+    regressions = []
+    print(f"\n{'route':<50} {'median ms':>10} {'baseline':>10} {'change':>8} {'peak MB':>9} {'baseline':>9} {'change':>8}")
+
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"{name:<50} {result['median_ms']:>10.1f} {'new':>10}")
+            continue
+
+        latency_change = result['median_ms'] / before['median_ms'] - 1 if before['median_ms'] else 0
+        memory_change = result['peak_memory_mb'] / before['peak_memory_mb'] - 1 if before['peak_memory_mb'] else 0
+        slower = latency_change > tolerance and result['median_ms'] - before['median_ms'] > MIN_REGRESSION_MS
+        more_memory = memory_change > tolerance and result['peak_memory_mb'] - before['peak_memory_mb'] > MIN_REGRESSION_MB
+        regressed = slower or more_memory
+        if regressed:
+            regressions.append(name)
+
+        print(f"{name:<50} {result['median_ms']:>10.1f} {before['median_ms']:>10.1f} {latency_change:>+8.0%} "
+              f"{result['peak_memory_mb']:>9.1f} {before['peak_memory_mb']:>9.1f} {memory_change:>+8.0%}"
+              f"{'  REGRESSION' if regressed else ''}")
+
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark every route on generated data')
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--courses', type=int, default=8, help='courses per student per semester')
+    parser.add_argument('--semesters', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5, help='runs per route')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare against the results in this JSON file')
+    parser.add_argument('--save-baseline', help='write the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument('--concurrency', type=int, default=0, metavar='READERS',
+                        help='afterwards, check that this many dashboard readers keep getting answers during uploads')
+    parser.add_argument('--uploads', type=int, default=2, help='uploads during the concurrency check')
+    parser.add_argument('--eligibility', action='store_true',
+                        help='only compare the eligibility engine with the legacy indirect fail code, on one semester')
+    parser.add_argument('--startup', action='store_true',
+                        help=f'only time cold starts of the app up to its first response, the target is {STARTUP_TARGET_SECONDS:g} s')
+    args = parser.parse_args()
+
+    if args.startup:
+        results = run_startup(args.repeat)
+        if args.output:
+            with open(os.path.abspath(args.output), 'w') as file:
+                json.dump(results, file, indent=2)
+        if results['lazy']['errors']:
+            print(f"\n{results['lazy']['errors']} start(s) didn't answer their first request")
+            sys.exit(1)
+        if results['lazy']['first_response_ms'] > results['target_ms']:
+            print(f"\nThe first response took {results['lazy']['first_response_ms']:.0f} ms, over the target of {results['target_ms']:.0f} ms")
+            sys.exit(1)
+        return
+
+    if args.eligibility:
+        results = run_eligibility(args.students, args.courses, args.seed, args.repeat)
+        if args.output:
+            with open(os.path.abspath(args.output), 'w') as file:
+                json.dump(results, file, indent=2)
+        if not results['same_result']:
+            print("\nThe eligibility engine gives another result than the legacy code")
+            sys.exit(1)
+        return
+
+    # Paths given on the command line are relative to where the benchmark was started
+    for name in ['output', 'baseline', 'save_baseline']:
+        if getattr(args, name):
+            setattr(args, name, os.path.abspath(getattr(args, name)))
+
+    first_year = 2015
+    scratch = tempfile.mkdtemp(prefix='attendance_benchmark_')
+
+    print(f"Generating {args.students} students x {args.courses} courses x {args.semesters} semesters in {scratch}", file=sys.stderr)
+    attendance_paths, bbs_path = write_dataset(os.path.join(scratch, 'data'), args.students, args.courses, args.semesters, args.seed, first_year)
+
+    # The app reads its database location and workspace folder from the environment, both are kept in the scratch folder
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(scratch, 'benchmark.db')}"
+    os.environ['WORKSPACE_FOLDER'] = os.path.join(scratch, 'workspaces')
+    os.chdir(scratch)
+    from app import create_app, init_app
+    app = init_app(create_app())
+
+    results = run_benchmark(app.test_client(), attendance_paths, bbs_path, first_year, args.repeat)
+    report = {
+        'config': {'students': args.students, 'courses': args.courses, 'semesters': args.semesters, 'seed': args.seed, 'repeat': args.repeat},
+        'results': results
+    }
+
+    if args.concurrency:
+        report['concurrency'] = run_concurrency(app, attendance_paths, first_year, args.concurrency, args.uploads)
+
+    for path in [args.output, args.save_baseline]:
+        if path:
+            with open(path, 'w') as file:
+                json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+
+        if baseline['config'] != report['config']:
+            print(f"Warning: baseline was recorded with {baseline['config']}", file=sys.stderr)
+
+        regressions = compare(results, baseline['results'], args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} route(s) regressed by more than {args.tolerance:.0%}")
+            sys.exit(1)
+
+    if args.concurrency:
+        concurrency = report['concurrency']
+        if concurrency['errors']:
+            print(f"\n{len(concurrency['errors'])} failed request(s) during the concurrency check: {concurrency['errors'][0]}")
+            sys.exit(1)
+        if concurrency['during_upload'].get('max_ms', 0) > STALL_SECONDS * 1000:
+            print(f"\nDashboard reads stalled for {concurrency['during_upload']['max_ms']:.0f} ms during an upload")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+import threading
+from collections import OrderedDict
+
+# Least recently used cache for parsed semester DataFrames, bounded by their memory usage
+# Keys are (year, semester_type, content hash) tuples, so a replaced upload never matches an old entry
+# Semesters loaded with only some of their columns add the tuple of column names to the key (see app.load_semester)
+class SemesterCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+
+            # Mark as most recently used
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key][0]
+
+    def put(self, key, df):
+        size = int(df.memory_usage(deep=True).sum())
+
+        # Frames bigger than the whole budget are never cached
+        if size > self.max_bytes:
+            return
+
+        with self.lock:
+            if key in self.entries:
+                self.current_bytes -= self.entries.pop(key)[1]
+
+            self.entries[key] = (df, size)
+            self.current_bytes += size
+
+            # Evict least recently used entries until we are back under budget
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+
+    # Remove every cached entry for a semester, used when the semester is uploaded again
+    def invalidate(self, year, semester_type):
+        with self.lock:
+            for key in [k for k in self.entries if k[0] == year and k[1] == semester_type]:
+                self.current_bytes -= self.entries.pop(key)[1]
+
+    def stats(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self.entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes
+            }
+
+# Least recently used cache for rendered responses, bounded by the size of their bodies
+# Keys are the ETag of the response (see app.table_view) and the content encoding it was compressed with
+class ResponseCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    # The cached (body, mimetype, headers), None when it isn't cached
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+
+    def put(self, key, body, mimetype, headers):
+        if len(body) > self.max_bytes:
+            return
+
+        with self.lock:
+            if key in self.entries:
+                self.current_bytes -= len(self.entries.pop(key)[0])
+
+            self.entries[key] = (body, mimetype, headers)
+            self.current_bytes += len(body)
+
+            while self.current_bytes > self.max_bytes:
+                _, (evicted_body, _, _) = self.entries.popitem(last=False)
+                self.current_bytes -= len(evicted_body)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self.entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes
+            }
@@ -0,0 +1,58 @@
+import gzip
+from metrics import phase
+
+# Brotli is optional, it needs the brotli package (pip install brotli), gzip is always there
+try:
+    import brotli # type: ignore
+except ImportError:
+    brotli = None
+
+# Compression of responses, picked from the encodings the browser accepts (brotli first, then gzip)
+# Tables and chart data are mostly repeated text and numbers, so they shrink to a fraction of their size
+
+# Responses smaller than this are sent as they are, compressing them saves less than it costs
+MIN_BYTES = 1024
+
+# Levels that compress well while staying fast enough for every response
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/html', 'text/csv', 'text/plain', 'text/css', 'text/javascript', 'application/javascript'}
+
+def accepted_encoding(request):
+    if brotli is not None and request.accept_encodings['br']:
+        return 'br'
+    if request.accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+# Compress the response in place when the browser accepts it and it is worth it
+# Streamed responses and files are left alone, they are sent before their size is known
+def compress_response(request, response):
+    if (response.direct_passthrough or response.is_streamed or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    # Caches have to keep compressed and uncompressed copies apart
+    response.vary.add('Accept-Encoding')
+
+    encoding = accepted_encoding(request)
+    if encoding is None or response.calculate_content_length() < MIN_BYTES:
+        return response
+
+    with phase('serialize'):
+        response.set_data(compress(response.get_data(), encoding))
+
+    response.headers['Content-Encoding'] = encoding
+
+    # The compressed body is another representation of the resource, so it gets its own ETag
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f'{etag}-{encoding}', weak)
+
+    return response
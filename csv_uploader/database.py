@@ -0,0 +1,188 @@
+import time
+from flask_sqlalchemy import SQLAlchemy # type: ignore
+from sqlalchemy import event # type: ignore
+
+# Database of the app, bound to an app in create_app (see app.py)
+# Everything web processes share lives here: the stored semesters, the session workspaces and the background jobs
+db = SQLAlchemy()
+
+# Settings of every SQLite connection
+SQLITE_PRAGMAS = {
+    # Readers keep reading the last committed data while an upload writes, instead of waiting for its commit
+    'journal_mode': 'WAL',
+    # With WAL, a commit is only lost on a power failure and the file is never corrupted, without syncing every commit
+    'synchronous': 'NORMAL',
+    # 64 MB page cache per connection (negative sizes are in kilobytes)
+    'cache_size': -64000,
+    # Read the first 256 MB of the file through memory mapping instead of read calls
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+    # Wait up to 30 seconds for another writer, instead of failing with "database is locked"
+    'busy_timeout': 30000
+}
+
+# Apply SQLITE_PRAGMAS to every connection the engine opens
+# Reads need no setting: the SQLite driver only opens a transaction for writes, so every read is its own short transaction
+def configure_sqlite(engine):
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+# Insert many rows with one statement, rows are tuples in the order of columns
+# SQLite gets the tuples straight through the driver, skipping the per row parameter handling of SQLAlchemy
+def bulk_insert(table, columns, rows):
+    connection = db.session.connection()
+
+    if connection.dialect.name == 'sqlite':
+        column_list = ', '.join(f'"{column}"' for column in columns)
+        placeholders = ', '.join('?' for _ in columns)
+        connection.exec_driver_sql(f"INSERT INTO {table.name} ({column_list}) VALUES ({placeholders})", rows)
+    else:
+        connection.execute(table.insert(), [dict(zip(columns, row)) for row in rows])
+
+# Take the write lock of the database before reading what a change depends on, so two processes can't both decide to make it
+# SQLite only locks at the first write, BEGIN IMMEDIATE takes the lock right away and waits for the busy timeout when it is held
+def begin_write():
+    connection = db.session.connection()
+    if connection.dialect.name == 'sqlite' and not connection.connection.dbapi_connection.in_transaction:
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+# Make sure the session has an open transaction before a savepoint is made in it
+# The SQLite driver only starts a transaction at the first write, a savepoint made before that is a transaction
+# of its own that commits when the savepoint is released
+def begin_transaction():
+    connection = db.session.connection()
+    if connection.dialect.name == 'sqlite' and not connection.connection.dbapi_connection.in_transaction:
+        connection.exec_driver_sql('BEGIN')
+
+# Database structure
+class AttendanceFile(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    year = db.Column(db.Integer, nullable=False)
+    semester_type = db.Column(db.String(10), nullable=False)
+    # Compressed Parquet semester data (see storage.py), only loaded from the database when it is accessed
+    csv_file = db.deferred(db.Column(db.LargeBinary, nullable=False))
+    # Metadata of the semester data, readable without loading it: SHA-1 of csv_file, number of rows and JSON list of columns
+    content_hash = db.Column(db.String(40))
+    row_count = db.Column(db.Integer)
+    column_names = db.Column(db.Text)
+
+    __table_args__ = (db.UniqueConstraint('year', 'semester_type', name='unique_semester'),)
+
+# Secondary index of where each student appears, one row per stored attendance row
+class StudentIndex(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    semester_id = db.Column(db.Integer, db.ForeignKey('attendance_file.id'), nullable=False, index=True)
+    nim = db.Column(db.BigInteger, nullable=False)
+    course_code = db.Column(db.String(20), nullable=False)
+    # Position of the row in the stored semester DataFrame
+    row = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (db.Index('ix_student_index_nim_course', 'nim', 'course_code'),)
+
+# Per student sums of each semester, so the pie and major charts don't need to group the course level rows
+class SemesterAggregate(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    semester_id = db.Column(db.Integer, db.ForeignKey('attendance_file.id'), nullable=False, unique=True)
+    # Parquet encoded NIM, MAJOR, TOTAL ABSENCE, SESSION DONE and TOTAL SESSION table
+    aggregate_file = db.Column(db.LargeBinary, nullable=False)
+
+# NIM and COURSE table and NIM table of a semester, kept so a newer snapshot of the semester only has to patch them
+class SemesterTables(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    semester_id = db.Column(db.Integer, db.ForeignKey('attendance_file.id'), nullable=False, unique=True)
+    # SHA-1 of the semester blob the tables were calculated from, tables of another version of the semester are ignored
+    source_hash = db.Column(db.String(40), nullable=False)
+    nim_course_file = db.Column(db.LargeBinary, nullable=False)
+    nim_file = db.Column(db.LargeBinary, nullable=False)
+
+# Workspace of a browser session (see workspace.py), last_used is a Unix timestamp
+class WorkspaceRecord(db.Model):
+    __tablename__ = 'workspace'
+    id = db.Column(db.String(32), primary_key=True)
+    last_used = db.Column(db.Float, nullable=False)
+
+# A working DataFrame of a workspace, an Arrow file in the workspace folder or pickled into data (see workspace.py)
+class WorkspaceFrame(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    workspace_id = db.Column(db.String(32), db.ForeignKey('workspace.id'), nullable=False, index=True)
+    name = db.Column(db.String(50), nullable=False)
+    # File name shown to the browser, and the id of the stored semester the frame was loaded from
+    label = db.Column(db.String(255), nullable=False)
+    source = db.Column(db.Integer)
+    # content_hash of the stored semester when the frame was loaded, the semester may have been replaced since
+    source_hash = db.Column(db.String(40))
+    # Changes every time the frame is replaced, so web processes know when the copy they hold in memory is outdated
+    version = db.Column(db.String(32), nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    data = db.deferred(db.Column(db.LargeBinary, nullable=False))
+
+    __table_args__ = (db.UniqueConstraint('workspace_id', 'name', name='unique_workspace_frame'),)
+
+# State of a background job (see jobs.py), shared so any web process can report on it or cancel it
+class JobRecord(db.Model):
+    __tablename__ = 'job'
+    id = db.Column(db.String(32), primary_key=True)
+    owner = db.Column(db.String(32), nullable=False, index=True)
+    kind = db.Column(db.String(50), nullable=False)
+    state = db.Column(db.String(10), nullable=False)
+    progress = db.Column(db.Float, nullable=False, default=0.0)
+    error = db.Column(db.Text)
+    # Set by a web process that can't cancel the job itself, the process running it picks it up
+    cancel_requested = db.Column(db.Boolean, nullable=False, default=False)
+    updated = db.Column(db.Float, nullable=False)
+
+# Job states in the database, used by JobManager from request handlers and from its own threads
+class JobStore:
+    def __init__(self, app):
+        self.app = app
+
+    def save(self, job_id, **fields):
+        with self.app.app_context():
+            record = db.session.get(JobRecord, job_id) or JobRecord(id=job_id)
+            for name, value in fields.items():
+                setattr(record, name, value)
+            record.updated = time.time()
+            db.session.add(record)
+            db.session.commit()
+
+    def get(self, job_id):
+        with self.app.app_context():
+            record = db.session.get(JobRecord, job_id)
+            if record is None:
+                return None
+            return {'jobId': record.id, 'kind': record.kind, 'state': record.state, 'progress': record.progress, 'error': record.error}
+
+    # The unfinished job of a kind and owner, if there is one
+    def current(self, owner, kind):
+        with self.app.app_context():
+            return db.session.query(JobRecord.id).filter(
+                JobRecord.owner == owner, JobRecord.kind == kind, JobRecord.state.in_(['queued', 'running'])
+            ).order_by(JobRecord.updated.desc()).limit(1).scalar()
+
+    # Returns False when the job doesn't exist or is already finished
+    def request_cancel(self, job_id):
+        with self.app.app_context():
+            updated = JobRecord.query.filter(JobRecord.id == job_id, JobRecord.state.in_(['queued', 'running'])).update(
+                {'cancel_requested': True}, synchronize_session=False)
+            db.session.commit()
+            return updated > 0
+
+    def cancel_requests(self, job_ids):
+        with self.app.app_context():
+            return [job_id for (job_id,) in db.session.query(JobRecord.id).filter(JobRecord.id.in_(job_ids), JobRecord.cancel_requested)]
+
+    # Forget all but the newest keep finished jobs
+    def prune(self, keep):
+        with self.app.app_context():
+            finished = JobRecord.query.filter(JobRecord.state.in_(['done', 'failed', 'cancelled']))
+            old_ids = [job_id for (job_id,) in finished.with_entities(JobRecord.id).order_by(JobRecord.updated.desc()).offset(keep)]
+            if old_ids:
+                JobRecord.query.filter(JobRecord.id.in_(old_ids)).delete(synchronize_session=False)
+                db.session.commit()
@@ -0,0 +1,60 @@
+from collections import Counter
+import numpy as np # type: ignore
+import pandas as pd # type: ignore
+
+# Eligibility of coupled course components
+# A student who fails one component of a coupled group fails the whole group in that course: with LEC and LAB coupled,
+# failing the LAB of a course also fails its LEC. Components the student passed on their own but fail this way are indirect fails.
+
+# Each rule is a group of components that are coupled in every course that has at least two of them
+COUPLING_RULES = (('LEC', 'LAB'),)
+
+# Series.isin as a boolean array, category columns are matched on their categories and looked up by code
+# which is several times faster than isin on the values
+def column_isin(column, values):
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        matches = np.append(column.cat.categories.isin(values), False)
+        return matches[column.cat.codes.to_numpy()]
+    return column.isin(values).to_numpy()
+
+# Courses each rule applies to, as {rule: list of course codes}
+# Decided on the whole semester, so pass it on when df is only part of a semester
+def coupled_courses(df, rules=COUPLING_RULES):
+    courses = {}
+    for rule in rules:
+        counts = Counter()
+        for component in rule:
+            counts.update(df.loc[column_isin(df['COMPONENT'], [component]), 'COURSE CODE'].unique())
+        courses[rule] = [course for course, count in counts.items() if count > 1]
+    return courses
+
+# Integer id of every (NIM, COURSE CODE) pair of df
+def student_course_keys(df):
+    nim_codes, _ = pd.factorize(df['NIM'])
+    course_codes, courses = pd.factorize(df['COURSE CODE'])
+    return nim_codes.astype(np.int64) * max(len(courses), 1) + course_codes
+
+# Eligibility after coupling, given the direct eligibility of every row (TOTAL ABSENCE <= MAX ABSENCE)
+# Returns the new ELIGIBLE and INDIRECT FAIL columns as boolean arrays, in the order of df
+# Only direct fails are passed on, a fail that was itself passed on by one rule doesn't trigger another
+def propagate_eligibility(df, eligible, courses=None, rules=COUPLING_RULES):
+    if courses is None:
+        courses = coupled_courses(df, rules)
+
+    eligible = np.asarray(eligible, dtype=bool)
+    failed = np.zeros(len(df), dtype=bool)
+    keys = None
+
+    for rule in rules:
+        coupled = column_isin(df['COURSE CODE'], courses.get(rule, [])) & column_isin(df['COMPONENT'], rule)
+        if not coupled.any():
+            continue
+
+        if keys is None:
+            keys = student_course_keys(df)
+
+        # A coupled row fails when any coupled row of its student and course failed directly
+        group_failed = pd.Series(~eligible[coupled]).groupby(keys[coupled], sort=False).transform('any').to_numpy()
+        failed[np.flatnonzero(coupled)[group_failed]] = True
+
+    return eligible & ~failed, failed & eligible
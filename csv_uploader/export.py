@@ -0,0 +1,130 @@
+import tempfile
+import pyarrow as pa # type: ignore
+import pyarrow.parquet as pq # type: ignore
+
+# XLSX export is optional, it needs openpyxl (pip install openpyxl)
+try:
+    from openpyxl import Workbook # type: ignore
+except ImportError:
+    Workbook = None
+
+# Downloads of working tables, written and sent a chunk of rows at a time so the whole file is never built in memory
+
+# Rows written per chunk
+CHUNK_ROWS = 50000
+
+# Bytes read per chunk from the temporary file an XLSX workbook is saved to
+FILE_CHUNK_BYTES = 1024 * 1024
+
+# Excel can't open sheets with more rows than this, header included
+XLSX_MAX_ROWS = 1048576
+
+# Mimetype and file extension of every export format
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet')
+}
+
+class ExportError(ValueError):
+    pass
+
+def row_chunks(df, transform):
+    for start in range(0, len(df), CHUNK_ROWS):
+        yield transform(df.iloc[start:start + CHUNK_ROWS])
+
+def csv_chunks(df, transform):
+    # The header is sent on its own, so an empty table still downloads with its columns
+    yield df.iloc[:0].to_csv(index=False).encode('utf-8')
+
+    for chunk in row_chunks(df, transform):
+        yield chunk.to_csv(index=False, header=False).encode('utf-8')
+
+# File object for the Parquet writer that hands out whatever was written since it was last emptied
+class StreamBuffer:
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+def parquet_chunks(df, transform):
+    buffer = StreamBuffer()
+    writer = None
+
+    # Every chunk becomes a row group, written with the column types of the first one
+    for chunk in row_chunks(df, transform):
+        if writer is None:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            writer = pq.ParquetWriter(pa.PythonFile(buffer, mode='w'), table.schema, compression='zstd')
+        else:
+            table = pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False)
+
+        writer.write_table(table)
+        yield buffer.take()
+
+    # An empty table still gets a file with its columns
+    if writer is None:
+        schema = pa.Table.from_pandas(df, preserve_index=False).schema
+        writer = pq.ParquetWriter(pa.PythonFile(buffer, mode='w'), schema, compression='zstd')
+
+    writer.close()
+    yield buffer.take()
+
+# An XLSX file is a zip archive that can only be finished at the end, so the write only workbook
+# keeps its rows in a temporary file instead of memory, and the saved file is sent from disk
+def xlsx_chunks(df, transform):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append([str(column) for column in df.columns])
+
+    for chunk in row_chunks(df, transform):
+        # Categories, nullable integers and missing values become plain Python values
+        values = chunk.astype(object).where(chunk.notna(), None)
+        for row in values.itertuples(index=False):
+            sheet.append(list(row))
+
+    with tempfile.TemporaryFile() as file:
+        workbook.save(file)
+        file.seek(0)
+        while True:
+            data = file.read(FILE_CHUNK_BYTES)
+            if not data:
+                break
+            yield data
+
+# Generator of the bytes of df in the given format, transform is applied to every chunk of rows before it is written
+# Raises ExportError when the format can't be written, before anything is generated
+def export_chunks(df, export_format, transform=lambda chunk: chunk):
+    if export_format == 'csv':
+        return csv_chunks(df, transform)
+
+    if export_format == 'parquet':
+        return parquet_chunks(df, transform)
+
+    if export_format == 'xlsx':
+        if Workbook is None:
+            raise ExportError('XLSX export needs openpyxl to be installed')
+        if len(df) >= XLSX_MAX_ROWS:
+            raise ExportError(f'Too many rows for an XLSX file ({len(df)}), export as CSV or Parquet instead')
+        return xlsx_chunks(df, transform)
+
+    raise ExportError(f'Unknown export format: {export_format}')
@@ -0,0 +1,138 @@
+import os
+import sys
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from ingest import ingest_attendance
+from storage import encode_semester
+from database import db, begin_transaction
+from app import create_app, init_app, parse_attendance_filename, store_semester
+
+# Bulk import of attendance exports, for filling the database with the history of earlier semesters
+# Run from anywhere: python csv_uploader/importer.py <folder of exports>
+# Files are named and filtered exactly like uploads (see app.upload_file), parsed in a pool of processes
+# and written by this process in batches of files per transaction. DATABASE_URL picks the database, like for the app.
+
+# Files written per transaction
+DEFAULT_BATCH = 10
+
+# Runs in a pool process: read, check and filter an export and encode what is stored for it
+def parse_export(path):
+    start = time.perf_counter()
+
+    with open(path, 'rb') as file:
+        semester_data, main_data, student_totals = ingest_attendance(file)
+
+    return semester_data, main_data, encode_semester(student_totals), time.perf_counter() - start
+
+# Exports of the folder to import, as (path, year, semester type, export date), and the files that can't be imported
+# Only the newest export of a semester is imported, the older ones would be replaced by it right away
+def plan_import(folder):
+    skipped = []
+    newest = {}
+
+    for name in sorted(os.listdir(folder)):
+        path = os.path.join(folder, name)
+        if not name.endswith('.csv') or not os.path.isfile(path):
+            continue
+
+        try:
+            year, semester_type, export_date = parse_attendance_filename(name)
+        except ValueError as e:
+            skipped.append((path, str(e)))
+            continue
+
+        current = newest.get((year, semester_type))
+        if current is not None and current[3] > export_date:
+            skipped.append((path, 'superseded by a newer export of the semester'))
+            continue
+        if current is not None:
+            skipped.append((current[0], 'superseded by a newer export of the semester'))
+
+        newest[(year, semester_type)] = (path, year, semester_type, export_date)
+
+    # Oldest exports first, so semesters get their ids in the order they happened
+    return sorted(newest.values(), key=lambda export: export[3]), skipped
+
+def report(path, semester, rows, parse_seconds, write_seconds, status):
+    print(f"{os.path.basename(path):<45} {semester:<12} {rows:>9} {parse_seconds:>8.1f} {write_seconds:>8.1f}  {status}", flush=True)
+
+def run_import(folder, workers, batch):
+    exports, skipped = plan_import(folder)
+    print(f"{'file':<45} {'semester':<12} {'rows':>9} {'parse s':>8} {'write s':>8}  status")
+
+    for path, reason in skipped:
+        report(path, '', 0, 0, 0, f"skipped: {reason}")
+
+    counts = {'imported': 0, 'replaced': 0, 'failed': 0}
+    started = time.perf_counter()
+    uncommitted = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Exports are written in order, while the pool parses the next ones, a few at a time so parsed semesters don't pile up
+        queue = iter(exports)
+        parsing = deque()
+
+        def submit_next():
+            export = next(queue, None)
+            if export is not None:
+                parsing.append((export, executor.submit(parse_export, export[0])))
+
+        for _ in range(workers * 2):
+            submit_next()
+
+        while parsing:
+            (path, year, semester_type, _), future = parsing.popleft()
+            submit_next()
+            semester = f"{semester_type} {year}"
+
+            try:
+                semester_data, main_data, aggregate_data, parse_seconds = future.result()
+            except Exception as e:
+                counts['failed'] += 1
+                report(path, semester, 0, 0, 0, f"error: {e}")
+                continue
+
+            # Every file is written in a savepoint, so a file that fails doesn't undo the rest of its batch
+            write_start = time.perf_counter()
+            try:
+                begin_transaction()
+                with db.session.begin_nested():
+                    _, replaced = store_semester(year, semester_type, semester_data, main_data, aggregate_data)
+            except Exception as e:
+                counts['failed'] += 1
+                report(path, semester, len(main_data), parse_seconds, time.perf_counter() - write_start, f"error: {e}")
+                continue
+
+            uncommitted += 1
+            if uncommitted >= batch:
+                db.session.commit()
+                uncommitted = 0
+
+            status = 'replaced' if replaced else 'imported'
+            counts[status] += 1
+            report(path, semester, len(main_data), parse_seconds, time.perf_counter() - write_start, status)
+
+    db.session.commit()
+
+    print(f"\n{counts['imported']} semester(s) imported, {counts['replaced']} replaced, {counts['failed']} failed, "
+          f"{len(skipped)} file(s) skipped in {time.perf_counter() - started:.1f} s")
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description='Import a folder of attendance exports into the database')
+    parser.add_argument('folder', help='folder with the exports, named like the uploads (... DD-MM-YYYY.csv)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='processes parsing exports')
+    parser.add_argument('--batch', type=int, default=DEFAULT_BATCH, help='files written per transaction')
+    args = parser.parse_args()
+
+    app = init_app(create_app())
+    with app.app_context():
+        counts = run_import(args.folder, max(args.workers, 1), max(args.batch, 1))
+
+    if counts['failed']:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
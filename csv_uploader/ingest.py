@@ -0,0 +1,103 @@
+import pandas as pd # type: ignore
+from storage import SemesterWriter, decode_semester
+from schema import ATTENDANCE_SCHEMA, BBS_SCHEMA, BBS_EXPORT_SCHEMA, read_types, validate, apply_schema
+from terms import binus_term_codes, pdpt_term_codes, student_type_capitalization, scu_formatter
+
+# Rows read from an uploaded export at a time, bounds the memory used by an upload regardless of file size
+CHUNK_ROWS = 50000
+
+# Courses that are not tracked
+EXCLUDED_COURSES = ['Excellence Program I', 'English Plus Stage One', 'English Plus Stage Two', 'Academic Advisory']
+
+# Columns kept from the BBS student list, and their new names
+BBS_COLUMNS = ["EXTERNAL SYSTEM ID", "BINUSIAN ID", "FULL NAME", "SEX", "CAMPUS", "ACAD PROG", "ACAD PLAN DESCR", 
+               "PROG STATUS", "ADMIT TERM", "INTAKE PDPT (Semester Awal)", "STUDENT TYPE", "TOTAL SCU (LAST TERM#)"]
+BBS_RENAMED_COLUMNS = ["EXTERNAL SYSTEM ID", "BINUSIAN ID", "FULL NAME", "GENDER", "CAMPUS", "ACAD PROG", "ACAD PLAN", 
+                       "PROG STATUS", "ADMIT TERM", "INTAKE PDPT", "STUDENT TYPE", "TOTAL SCU (LAST TERM)"]
+
+# Apply the upload filters to (a chunk of) an attendance export
+def filter_attendance(df):
+    # Exclude rows where 'COURSE NAME' is one of the specified courses
+    df = df[~df['COURSE NAME'].isin(EXCLUDED_COURSES)]
+
+    # Exclude rows where 'MAJOR' is 'Non Degree Program'
+    df = df[df['MAJOR'] != 'Non Degree Program']
+
+    # Filter out students with 0 sessions so far
+    df = df[df['SESSION DONE'] > 0].copy()
+
+    # Consider both "Fashion Design" and "Fashion Management" as just 'Fashion'
+    df['MAJOR'] = df['MAJOR'].replace({'Fashion Design': 'Fashion', 'Fashion Management': 'Fashion'})
+
+    return df
+
+# Sum the absences and sessions of every student in a semester
+def aggregate_semester(df):
+    return df.groupby(['NIM', 'MAJOR'], sort=False, observed=True)[['TOTAL ABSENCE', 'SESSION DONE', 'TOTAL SESSION']].sum().reset_index()
+
+# Read an attendance export chunk by chunk, building the stored blob in the same pass
+# Every filtered chunk goes to the Parquet writer as it arrives and is dropped, so only one chunk of the upload is in memory
+# Returns the stored blob, the working DataFrame and the per student totals
+def ingest_attendance(file):
+    writer = SemesterWriter()
+    partial_totals = []
+    columns = None
+
+    # Text columns are read as strings in every chunk, so a chunk can't guess a different type than the others
+    chunks = pd.read_csv(file, delimiter=";", encoding="Windows-1252", chunksize=CHUNK_ROWS, dtype=read_types(ATTENDANCE_SCHEMA))
+
+    for i, chunk in enumerate(chunks):
+        validate(chunk, ATTENDANCE_SCHEMA, i * CHUNK_ROWS)
+        chunk = filter_attendance(apply_schema(chunk, ATTENDANCE_SCHEMA, categories=False))
+
+        # The writer fixes the column types from the first chunk
+        writer.write(chunk)
+        partial_totals.append(aggregate_semester(chunk))
+        columns = list(chunk.columns)
+
+    if columns is None:
+        raise ValueError('The uploaded file is empty')
+
+    blob = writer.finish()
+
+    # Totals are sums, so the totals of each chunk can be added up
+    totals = pd.concat(partial_totals, ignore_index=True)
+    totals = totals.groupby(['NIM', 'MAJOR'], sort=False)[['TOTAL ABSENCE', 'SESSION DONE', 'TOTAL SESSION']].sum().reset_index()
+
+    # The working DataFrame is read back from the blob a column at a time, so only one column is ever held as text
+    # Categories are set on the whole column, so they are the same as for a semester loaded from the database
+    main_data = pd.DataFrame({name: apply_schema(decode_semester(blob, [name]), ATTENDANCE_SCHEMA)[name] for name in columns})
+
+    return blob, main_data, totals
+
+# Keep, rename and format the needed columns of (a chunk of) a BBS student list
+def format_bbs(df):
+    # Filter desired columns
+    df_filtered = df[BBS_COLUMNS].copy()
+
+    # Renaming columns
+    df_filtered.columns = BBS_RENAMED_COLUMNS
+
+    # Formatting values, terms are kept as integer codes (see terms.py)
+    df_filtered["ADMIT TERM"] = binus_term_codes(df_filtered["ADMIT TERM"])
+    df_filtered["INTAKE PDPT"] = pdpt_term_codes(df_filtered["INTAKE PDPT"])
+    df_filtered["STUDENT TYPE"] = student_type_capitalization(df_filtered['STUDENT TYPE'])
+    df_filtered["TOTAL SCU (LAST TERM)"] = scu_formatter(df_filtered["TOTAL SCU (LAST TERM)"])
+
+    # Only AC and LA are needed
+    return df_filtered[(df_filtered["PROG STATUS"] == 'AC') | (df_filtered["PROG STATUS"] == 'LA')]
+
+# Read a BBS student list chunk by chunk, formatting each chunk as it comes in
+def ingest_bbs(file):
+    formatted_chunks = []
+
+    chunks = pd.read_csv(file, delimiter=";", encoding="Windows-1252", chunksize=CHUNK_ROWS, dtype=read_types(BBS_EXPORT_SCHEMA))
+
+    for i, chunk in enumerate(chunks):
+        validate(chunk, BBS_EXPORT_SCHEMA, i * CHUNK_ROWS, required=BBS_COLUMNS)
+        formatted_chunks.append(format_bbs(chunk))
+
+    if not formatted_chunks:
+        raise ValueError('The uploaded file is empty')
+
+    return apply_schema(pd.concat(formatted_chunks, ignore_index=True), BBS_SCHEMA)
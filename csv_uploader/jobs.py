@@ -0,0 +1,175 @@
+import time
+import uuid
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Number of finished jobs kept around for status polling
+JOB_HISTORY = 100
+
+# Seconds between copies of the progress of running jobs to the store, and checks for cancel requests from other web processes
+SYNC_SECONDS = 0.25
+
+class JobCancelled(Exception):
+    pass
+
+# Progress callback for running a job function directly inside the request
+def no_progress(fraction):
+    pass
+
+# Runs in a pool process, progress goes back to the web process through a manager dictionary
+# Job functions are called as function(report, *args) and return their result, which is pickled back to the web process
+# A job that is cancelled is in the cancelled dictionary, which stops it the next time it reports
+def run_job(job_id, progress, cancelled, function, args):
+    def report(fraction):
+        if job_id in cancelled:
+            raise JobCancelled()
+        progress[job_id] = fraction
+
+    report(0.0)
+    result = function(report, *args)
+    report(1.0)
+    return result
+
+# Runs the long calculations in a local process pool, one current job per kind and owner (the session workspace)
+# Job states are kept in a store shared by all web processes (see database.JobStore), so a job can be polled
+# and cancelled through any of them. The web process that submitted a job runs it and hands its result over.
+class JobManager:
+    def __init__(self, max_workers, store):
+        self.max_workers = max_workers
+        self.store = store
+        self.executor = None
+        self.manager = None
+        self.progress = None
+        self.cancelled = None
+        self.sync_thread = None
+        # Jobs of this web process that haven't finished yet
+        self.jobs = {}
+        self.lock = threading.RLock()
+
+    # The pool and the manager process are only started once the first job comes in
+    def start(self):
+        if self.executor is None:
+            self.manager = multiprocessing.Manager()
+            self.progress = self.manager.dict()
+            self.cancelled = self.manager.dict()
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+
+    # handoff is called in the web process with the result of a job that finished successfully
+    def submit(self, owner, kind, function, args, handoff):
+        job_id = uuid.uuid4().hex
+
+        with self.lock:
+            self.start()
+
+            # A new job replaces the running job of the same kind, its results would be outdated anyway
+            current_id = self.store.current(owner, kind)
+            if current_id is not None:
+                self.cancel(current_id)
+
+            job = {
+                'owner': owner,
+                'kind': kind,
+                'state': 'queued',
+                'progress': 0.0,
+                'error': None,
+                'handoff': handoff,
+                'future': None
+            }
+            self.jobs[job_id] = job
+            self.store.save(job_id, owner=owner, kind=kind, state='queued', progress=0.0, error=None)
+
+            job['future'] = self.executor.submit(run_job, job_id, self.progress, self.cancelled, function, args)
+
+            if self.sync_thread is None:
+                self.sync_thread = threading.Thread(target=self.sync, daemon=True)
+                self.sync_thread.start()
+
+        job['future'].add_done_callback(lambda future: self.finish(job_id, future))
+        return job_id
+
+    # Hand the result over, unless the job failed or was cancelled
+    def finish(self, job_id, future):
+        with self.lock:
+            job = self.jobs[job_id]
+            job['progress'] = self.progress.pop(job_id, job['progress'])
+            self.cancelled.pop(job_id, None)
+
+            if job['state'] == 'cancelled' or future.cancelled():
+                job['state'] = 'cancelled'
+            elif future.exception() is not None:
+                if isinstance(future.exception(), JobCancelled):
+                    job['state'] = 'cancelled'
+                else:
+                    job['state'] = 'failed'
+                    job['error'] = str(future.exception())
+            else:
+                try:
+                    job['handoff'](future.result())
+                    job['state'] = 'done'
+                except Exception as e:
+                    job['state'] = 'failed'
+                    job['error'] = str(e)
+
+            del self.jobs[job_id]
+            self.store.save(job_id, state=job['state'], progress=job['progress'], error=job['error'])
+            self.store.prune(JOB_HISTORY)
+
+    # Runs while this web process has unfinished jobs, keeping the store up to date and picking up cancel requests
+    def sync(self):
+        while True:
+            time.sleep(SYNC_SECONDS)
+
+            with self.lock:
+                if not self.jobs:
+                    self.sync_thread = None
+                    return
+
+                for job_id in self.store.cancel_requests(list(self.jobs)):
+                    self.cancel(job_id)
+
+                for job_id in list(self.jobs):
+                    job = self.refresh(job_id)
+                    self.store.save(job_id, state=job['state'], progress=job['progress'])
+
+    def status(self, job_id):
+        with self.lock:
+            if job_id in self.jobs:
+                return self.local_status(job_id)
+
+        # Finished jobs, and jobs of other web processes
+        return self.store.get(job_id)
+
+    def local_status(self, job_id):
+        with self.lock:
+            job = self.refresh(job_id)
+            return {'jobId': job_id, 'kind': job['kind'], 'state': job['state'], 'progress': job['progress'], 'error': job['error']}
+
+    # Take over the progress reported by the pool process, a queued job is running once it reported
+    def refresh(self, job_id):
+        with self.lock:
+            job = self.jobs[job_id]
+
+            fraction = self.progress.get(job_id)
+            if fraction is not None and job['state'] in ('queued', 'running'):
+                job['state'] = 'running'
+                job['progress'] = fraction
+
+            return job
+
+    # Jobs that haven't started are dropped from the pool, running jobs stop at their next progress report
+    # Either way the results are discarded, returns False when there is nothing left to cancel
+    def cancel(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is not None:
+                if job['state'] not in ('queued', 'running'):
+                    return False
+
+                job['state'] = 'cancelled'
+                self.cancelled[job_id] = True
+                job['future'].cancel()
+                return True
+
+        # Jobs of other web processes are cancelled by them, the next time they sync
+        return self.store.request_cancel(job_id)
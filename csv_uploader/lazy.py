@@ -0,0 +1,24 @@
+import importlib
+
+# Stand in for a module that is only imported when one of its names is first used
+# The modules built on pandas take most of the start up time of a web process, and many requests never need them
+class LazyModule:
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    # import_module holds the import lock, so threads that get here at the same time import the module once
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attribute):
+        return getattr(self._load(), attribute)
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f"<lazy module '{self._name}' ({state})>"
+
+def lazy_import(name):
+    return LazyModule(name)
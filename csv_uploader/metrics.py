@@ -0,0 +1,147 @@
+import time
+import threading
+from contextlib import contextmanager
+import flask # type: ignore
+from flask import g, has_request_context # type: ignore
+from sqlalchemy import event # type: ignore
+
+# Request instrumentation, exposed in the Prometheus text format on /metrics
+# Every request is split into phases: the time spent in database queries, decoding CSV and stored blobs,
+# serializing the response and reading or writing local files. Whatever is left over is counted as compute,
+# which is mostly pandas. Only the innermost phase counts, so a query made while decoding is database time.
+
+PHASES = ['db', 'decode', 'serialize', 'io', 'compute']
+
+DURATION_BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+ROW_BUCKETS = [10, 100, 1000, 10000, 100000, 1000000, 10000000]
+BYTE_BUCKETS = [1000, 10000, 100000, 1000000, 10000000, 100000000]
+
+class Histogram:
+    def __init__(self, name, description, label_names, buckets):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self.buckets = buckets
+        # Label values to per bucket counts (not cumulative), sum and count
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self.lock:
+            series = self.series.setdefault(labels, {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0})
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['buckets'][i] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+
+        with self.lock:
+            for labels, series in sorted(self.series.items()):
+                label_text = ','.join(f'{name}="{value}"' for name, value in zip(self.label_names, labels))
+                cumulative = 0
+                for bound, count in zip(self.buckets, series['buckets']):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+                lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {series["count"]}')
+                lines.append(f'{self.name}_sum{{{label_text}}} {series["sum"]}')
+                lines.append(f'{self.name}_count{{{label_text}}} {series["count"]}')
+
+        return lines
+
+request_duration = Histogram('attendance_request_duration_seconds', 'Time spent handling a request', ['route', 'method'], DURATION_BUCKETS)
+phase_duration = Histogram('attendance_request_phase_seconds', 'Time spent in each phase of a request', ['route', 'phase'], DURATION_BUCKETS)
+rows_processed = Histogram('attendance_request_rows', 'DataFrame rows loaded by a request', ['route'], ROW_BUCKETS)
+payload_bytes = Histogram('attendance_request_payload_bytes', 'Size of request and response bodies', ['route', 'direction'], BYTE_BUCKETS)
+
+HISTOGRAMS = [request_duration, phase_duration, rows_processed, payload_bytes]
+
+def start_request():
+    g.request_started = time.perf_counter()
+    g.phase_times = dict.fromkeys(PHASES, 0.0)
+    g.phase_stack = []
+    g.rows = 0
+
+def tracking():
+    return has_request_context() and 'phase_stack' in g
+
+def start_phase(name):
+    if not tracking():
+        return
+
+    now = time.perf_counter()
+
+    # The outer phase is paused while the inner one runs
+    if g.phase_stack:
+        g.phase_times[g.phase_stack[-1]] += now - g.phase_started
+
+    g.phase_stack.append(name)
+    g.phase_started = now
+
+def end_phase():
+    if not tracking() or not g.phase_stack:
+        return
+
+    now = time.perf_counter()
+    g.phase_times[g.phase_stack.pop()] += now - g.phase_started
+    g.phase_started = now
+
+@contextmanager
+def phase(name):
+    start_phase(name)
+    try:
+        yield
+    finally:
+        end_phase()
+
+# Record the rows of a DataFrame the request loaded
+def count_rows(df):
+    if tracking():
+        g.rows += len(df)
+
+# jsonify, with the time it takes counted as serialization
+def jsonify(*args, **kwargs):
+    with phase('serialize'):
+        return flask.jsonify(*args, **kwargs)
+
+# Count the time of every query on the engine as database time
+def track_queries(engine):
+    event.listen(engine, 'before_cursor_execute', lambda *args: start_phase('db'))
+    event.listen(engine, 'after_cursor_execute', lambda *args: end_phase())
+    event.listen(engine, 'handle_error', lambda context: end_phase())
+
+# Observe the finished request, returns the total duration and the time of each phase
+def finish_request(request, response):
+    if 'request_started' not in g:
+        return None, None
+
+    total = time.perf_counter() - g.request_started
+    phase_times = dict(g.phase_times)
+    phase_times['compute'] = max(total - sum(phase_times.values()), 0.0)
+
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+
+    request_duration.observe((route, request.method), total)
+    for name, seconds in phase_times.items():
+        phase_duration.observe((route, name), seconds)
+
+    rows_processed.observe((route,), g.rows)
+
+    if request.content_length is not None:
+        payload_bytes.observe((route, 'in'), request.content_length)
+
+    # Streamed responses have no length until they are sent
+    response_length = response.calculate_content_length()
+    if response_length is not None:
+        payload_bytes.observe((route, 'out'), response_length)
+
+    return total, phase_times
+
+def expose():
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.expose())
+    return '\n'.join(lines) + '\n'
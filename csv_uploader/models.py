@@ -1,28 +1,212 @@
-import pandas as pd # type: ignore
+import os
 import random
+import argparse
+import numpy as np # type: ignore
+import pandas as pd # type: ignore
+from ingest import format_bbs
+from schema import BBS_SCHEMA, apply_schema
+from study_period import add_extended_columns, find_students_to_extend
 
-# Specify the file name here
-file_name = r'''C:\Users\Brandon Salim\Desktop\Data\Mockdata Attendance 24.2 sd 11-01-2018.csv'''
+# Mock data for development and benchmarking
+# Attendance exports and BBS student lists are written exactly like the real ones (semicolon separated, Windows-1252)
+# with file names the upload routes accept. The same seed always gives the same files.
 
-try:
-    # Load CSV into DataFrame
-    df = pd.read_csv(file_name)
+ATTENDANCE_COLUMNS = ['ACAD CAREER', 'STRM', 'NIM', 'NAME', 'BINUSIAN ID', 'MAJOR', 'COURSE CODE', 'COURSE NAME', 'CLASS',
+                      'COMPONENT', 'SKS', 'TOTAL SESSION', 'SESSION DONE', 'TOTAL ABSENCE', 'MAX ABSENCE']
 
-    # Check if 'PRESENT' column exists
-    if 'PRESENT' in df.columns:
-        # Generate a random threshold between 1 and 100
-        threshold = random.randint(1, 100)
+BBS_COLUMNS = ["EXTERNAL SYSTEM ID", "BINUSIAN ID", "FULL NAME", "SEX", "CAMPUS", "ACAD PROG", "ACAD PLAN DESCR",
+               "PROG STATUS", "ADMIT TERM", "INTAKE PDPT (Semester Awal)", "STUDENT TYPE", "TOTAL SCU (LAST TERM#)"]
 
-        # Assign 'Y' or 'N' based on the threshold
-        df['PRESENT'] = df['PRESENT'].apply(lambda _: 'Y' if random.randint(1, 100) > threshold else 'N')
-        
-        # Save the modified DataFrame
-        df.to_csv(file_name, index=False)
-        
-        print(f"File saved.")
+# Includes the majors the upload filters and merges
+MAJORS = ['Computer Science', 'Information Systems', 'Accounting', 'Management', 'Psychology', 'Architecture',
+          'Fashion Design', 'Fashion Management', 'Non Degree Program']
+MAJOR_WEIGHTS = [0.2, 0.15, 0.15, 0.15, 0.1, 0.1, 0.06, 0.06, 0.03]
 
-    else:
-        print("Error: 'PRESENT' column not found in the CSV.")
+# Courses the upload leaves out, a few students take them every semester
+EXCLUDED_COURSE_NAMES = ['Excellence Program I', 'English Plus Stage One', 'English Plus Stage Two', 'Academic Advisory']
+
+FIRST_NIM = 2500000000
+
+# Courses of the catalogue are LEC and LAB, LEC only, EXL or BLK in turn
+COURSE_COMPONENTS = [['LEC', 'LAB'], ['LEC'], ['EXL'], ['BLK']]
+
+def course_catalogue(size):
+    courses = pd.DataFrame({'COURSE CODE': [f"COMP{6000 + i}" for i in range(size)],
+                            'COURSE NAME': [f"Course {i}" for i in range(size)]})
+    courses['KIND'] = np.arange(size) % len(COURSE_COMPONENTS)
+    return courses
+
+# Students stay the same over every semester, so the student and course charts have a history to show
+def generate_students(n_students, seed=0):
+    rng = np.random.default_rng([seed, 0])
+    students = pd.DataFrame({'NIM': FIRST_NIM + np.arange(n_students, dtype=np.int64)})
+    students['NAME'] = [f"Student {i}" for i in range(n_students)]
+    students['BINUSIAN ID'] = [f"BN{i:09d}" for i in range(n_students)]
+    students['MAJOR'] = rng.choice(MAJORS, n_students, p=MAJOR_WEIGHTS)
+    # How often a student tends to be absent
+    students['ABSENCE RATE'] = rng.beta(1.2, 12, n_students)
+    return students
+
+# One semester of attendance, semester is the position of the semester in the generated series
+def generate_attendance(students, n_courses, semester=0, seed=0, strm='2410'):
+    rng = np.random.default_rng([seed, 1, semester])
+    catalogue = course_catalogue(max(4 * n_courses, 8))
+
+    # Every student takes n_courses different courses, picked by sorting random keys
+    picks = np.argsort(rng.random((len(students), len(catalogue))), axis=1)[:, :n_courses]
+    student_rows = np.repeat(np.arange(len(students)), n_courses)
+    enrolled = catalogue.iloc[picks.ravel()].reset_index(drop=True)
+    enrolled['STUDENT'] = student_rows
+
+    # One row per component, LEC and LAB courses get two rows
+    component_lists = enrolled['KIND'].map(dict(enumerate(COURSE_COMPONENTS)))
+    enrolled = enrolled.loc[enrolled.index.repeat(component_lists.str.len())].reset_index(drop=True)
+    enrolled['COMPONENT'] = np.concatenate(component_lists.to_numpy())
+
+    # A few rows of courses the upload leaves out
+    excluded = rng.random(len(enrolled)) < 0.01
+    enrolled.loc[excluded, 'COURSE NAME'] = rng.choice(EXCLUDED_COURSE_NAMES, int(excluded.sum()))
+
+    n_rows = len(enrolled)
+    total_session = np.where(enrolled['COMPONENT'] == 'EXL', 6, 13)
+
+    # How far the semester is when the export was taken, some rows have no sessions yet
+    progress = rng.uniform(0.3, 1.0)
+    session_done = np.minimum(rng.binomial(total_session, progress), total_session)
+    absence_rate = students['ABSENCE RATE'].to_numpy()[enrolled['STUDENT'].to_numpy()]
+    total_absence = rng.binomial(session_done, absence_rate)
+
+    df = pd.DataFrame({
+        'ACAD CAREER': 'RS1',
+        'STRM': strm,
+        'NIM': students['NIM'].to_numpy()[enrolled['STUDENT']],
+        'NAME': students['NAME'].to_numpy()[enrolled['STUDENT']],
+        'BINUSIAN ID': students['BINUSIAN ID'].to_numpy()[enrolled['STUDENT']],
+        'MAJOR': students['MAJOR'].to_numpy()[enrolled['STUDENT']],
+        'COURSE CODE': enrolled['COURSE CODE'],
+        'COURSE NAME': enrolled['COURSE NAME'],
+        'CLASS': [f"L{c}" for c in rng.integers(1, 10, n_rows) * 10 + rng.integers(0, 10, n_rows)],
+        'COMPONENT': enrolled['COMPONENT'],
+        'SKS': np.where(enrolled['COMPONENT'] == 'LAB', 2, 4),
+        'TOTAL SESSION': total_session,
+        'SESSION DONE': session_done,
+        'TOTAL ABSENCE': total_absence,
+        'MAX ABSENCE': total_session // 4
+    }, columns=ATTENDANCE_COLUMNS)
+
+    return df
+
+# A BBS student list of the generated students, terms come in the raw formats of the export:
+# ADMIT TERM as two digit year, semester and period (1912), INTAKE PDPT as full year and semester (20191)
+# Students were admitted in the six years before match_year, so some of them reach their max study period in it
+def generate_bbs(students, seed=0, match_year=2024):
+    rng = np.random.default_rng([seed, 2])
+    n_students = len(students)
+
+    admit_year = rng.integers(match_year - 6, match_year, n_students)
+    admit_term = (admit_year % 100) * 100 + rng.integers(1, 3, n_students) * 10 + rng.integers(1, 3, n_students)
+
+    # Half of the students have a PDPT intake, the others leave the column empty
+    pdpt_term = pd.Series(admit_year * 10 + rng.integers(1, 3, n_students)).where(rng.random(n_students) < 0.5)
+    scu = pd.Series(rng.integers(0, 150, n_students)).where(rng.random(n_students) > 0.05)
+
+    df = pd.DataFrame({
+        "EXTERNAL SYSTEM ID": students['NIM'].to_numpy(),
+        "BINUSIAN ID": students['BINUSIAN ID'].to_numpy(),
+        "FULL NAME": students['NAME'].to_numpy(),
+        "SEX": rng.choice(['M', 'F'], n_students),
+        "CAMPUS": rng.choice(['KMG', 'ALS', 'SNY'], n_students),
+        "ACAD PROG": rng.choice(['RS1', 'RS2'], n_students, p=[0.9, 0.1]),
+        "ACAD PLAN DESCR": students['MAJOR'].to_numpy(),
+        "PROG STATUS": rng.choice(['AC', 'LA', 'DC', 'CM'], n_students, p=[0.7, 0.15, 0.1, 0.05]),
+        "ADMIT TERM": admit_term,
+        "INTAKE PDPT (Semester Awal)": pdpt_term.astype('Int64'),
+        "STUDENT TYPE": rng.choice(['regular', 'master_track', 'fast_track', 'rpl'], n_students, p=[0.85, 0.05, 0.05, 0.05]),
+        "TOTAL SCU (LAST TERM#)": scu.astype('Int64')
+    }, columns=BBS_COLUMNS)
 
-except FileNotFoundError:
-    print("Error: File not found. Check the file name and try again.")
+    # The student list of the first period of match_year has to find students, or the data wouldn't exercise its matching
+    extended = add_extended_columns(apply_schema(format_bbs(df), BBS_SCHEMA))
+    assert len(find_students_to_extend(extended, match_year % 100, 1, 1)) > 0, 'no students to extend in the generated BBS list'
+
+    return df
+
+# Upload dates of a series of semesters starting at the odd semester of first_year
+# Odd semesters are exported in October, even semesters in March of the next year
+def semester_dates(n_semesters, first_year):
+    dates = []
+    for i in range(n_semesters):
+        year = first_year + i // 2
+        dates.append((11, 10, year) if i % 2 == 0 else (11, 3, year + 1))
+    return dates
+
+def attendance_file_name(day, month, year):
+    return f"Mockdata Attendance sd {day:02d}-{month:02d}-{year}.csv"
+
+def bbs_file_name(day, month, year):
+    return f"STUDENT LIST BBS_{day:02d}-{month:02d}-{year}.csv"
+
+def write_export(df, path):
+    df.to_csv(path, sep=";", index=False, encoding="Windows-1252")
+
+# Write a whole data set into folder, returns the attendance file paths (oldest first) and the BBS file path
+def write_dataset(folder, n_students, n_courses, n_semesters, seed=0, first_year=2015):
+    os.makedirs(folder, exist_ok=True)
+    students = generate_students(n_students, seed)
+
+    attendance_paths = []
+    for i, (day, month, year) in enumerate(semester_dates(n_semesters, first_year)):
+        path = os.path.join(folder, attendance_file_name(day, month, year))
+        strm = f"{(first_year + i // 2) % 100}{i % 2 + 1}0"
+        write_export(generate_attendance(students, n_courses, i, seed, strm), path)
+        attendance_paths.append(path)
+
+    # The BBS list is taken in September after the last semester
+    last_year = semester_dates(n_semesters, first_year)[-1][2]
+    bbs_path = os.path.join(folder, bbs_file_name(11, 9, last_year))
+    # Matched for the year of the last semester, like the benchmark does
+    write_export(generate_bbs(students, seed, first_year + (n_semesters - 1) // 2), bbs_path)
+
+    return attendance_paths, bbs_path
+
+# Randomize the PRESENT column of an existing mock attendance file
+def randomize_present(file_name):
+    try:
+        # Load CSV into DataFrame
+        df = pd.read_csv(file_name)
+
+        # Check if 'PRESENT' column exists
+        if 'PRESENT' in df.columns:
+            # Generate a random threshold between 1 and 100
+            threshold = random.randint(1, 100)
+
+            # Assign 'Y' or 'N' based on the threshold
+            df['PRESENT'] = df['PRESENT'].apply(lambda _: 'Y' if random.randint(1, 100) > threshold else 'N')
+
+            # Save the modified DataFrame
+            df.to_csv(file_name, index=False)
+
+            print(f"File saved.")
+
+        else:
+            print("Error: 'PRESENT' column not found in the CSV.")
+
+    except FileNotFoundError:
+        print("Error: File not found. Check the file name and try again.")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate mock attendance exports and a BBS student list')
+    parser.add_argument('folder', nargs='?', default='mock_data', help='folder to write the files to')
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--courses', type=int, default=8, help='courses per student per semester')
+    parser.add_argument('--semesters', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--first-year', type=int, default=2015)
+    parser.add_argument('--randomize-present', metavar='FILE', help='only randomize the PRESENT column of an existing file')
+    args = parser.parse_args()
+
+    if args.randomize_present:
+        randomize_present(args.randomize_present)
+    else:
+        attendance_paths, bbs_path = write_dataset(args.folder, args.students, args.courses, args.semesters, args.seed, args.first_year)
+        print(f"Wrote {len(attendance_paths)} attendance files and {os.path.basename(bbs_path)} to {args.folder}")
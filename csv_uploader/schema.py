@@ -0,0 +1,105 @@
+import numpy as np # type: ignore
+import pandas as pd # type: ignore
+
+# Column types of the attendance exports and BBS student lists, shared by ingest and every read of stored data
+# Exports are read with the raw types (text and whole numbers) and checked, the category types are applied
+# once the whole file is read, so every chunk ends up with the same categories.
+
+# Attendance export, as it comes in
+ATTENDANCE_SCHEMA = {
+    'ACAD CAREER': 'category',
+    'STRM': 'category',
+    'NIM': 'int64',
+    'NAME': 'object',
+    'BINUSIAN ID': 'object',
+    'MAJOR': 'category',
+    'COURSE CODE': 'category',
+    'COURSE NAME': 'category',
+    'CLASS': 'category',
+    'COMPONENT': 'category',
+    'SKS': 'int8',
+    'TOTAL SESSION': 'int16',
+    'SESSION DONE': 'int16',
+    'TOTAL ABSENCE': 'int16',
+    'MAX ABSENCE': 'int16'
+}
+
+# Formatted BBS student list (see ingest.format_bbs), terms are integer codes (see terms.py)
+BBS_SCHEMA = {
+    'EXTERNAL SYSTEM ID': 'object',
+    'BINUSIAN ID': 'object',
+    'FULL NAME': 'object',
+    'GENDER': 'category',
+    'CAMPUS': 'category',
+    'ACAD PROG': 'category',
+    'ACAD PLAN': 'category',
+    'PROG STATUS': 'category',
+    'ADMIT TERM': 'int64',
+    'INTAKE PDPT': 'int64',
+    'STUDENT TYPE': 'category',
+    'TOTAL SCU (LAST TERM)': 'object'
+}
+
+# BBS export, as it comes in, terms and SCU may be empty and the external id is kept as text
+BBS_EXPORT_SCHEMA = {
+    'EXTERNAL SYSTEM ID': 'object',
+    'BINUSIAN ID': 'object',
+    'FULL NAME': 'object',
+    'SEX': 'category',
+    'CAMPUS': 'category',
+    'ACAD PROG': 'category',
+    'ACAD PLAN DESCR': 'category',
+    'PROG STATUS': 'category',
+    'ADMIT TERM': 'Int64',
+    'INTAKE PDPT (Semester Awal)': 'Int64',
+    'STUDENT TYPE': 'category'
+}
+
+class SchemaError(ValueError):
+    pass
+
+def is_integer_type(dtype):
+    return dtype in ('int8', 'int16', 'int32', 'int64', 'Int64')
+
+# read_csv types of an export, text columns come in as text and whole number columns are checked by validate
+def read_types(schema):
+    return {column: str for column, dtype in schema.items() if dtype in ('category', 'object')}
+
+# Check a (chunk of an) export against the schema, raises SchemaError naming the column and the first bad row
+# first_row is the row number of the chunk's first row in the file, for the message
+def validate(df, schema, first_row=0, required=None):
+    missing = [column for column in (required or schema) if column not in df.columns]
+    if missing:
+        raise SchemaError(f"Missing columns: {', '.join(missing)}")
+
+    for column, dtype in schema.items():
+        if column not in df.columns or not is_integer_type(dtype):
+            continue
+
+        values = pd.to_numeric(df[column], errors='coerce')
+
+        # Nullable columns may be empty, the others need a whole number in every row
+        bad = values.isna() & df[column].notna() if dtype == 'Int64' else values.isna()
+        bad |= values.notna() & (values != values.round())
+
+        if dtype != 'Int64':
+            limits = np.iinfo(dtype)
+            bad |= (values < limits.min) | (values > limits.max)
+
+        if bad.any():
+            position = int(np.flatnonzero(bad.to_numpy())[0])
+            line = first_row + position + 2 # 1 for the header, 1 for counting from 1
+            value = df[column].iloc[position]
+
+            if pd.isna(value):
+                raise SchemaError(f"Empty value in column {column} on line {line}")
+            raise SchemaError(f"Invalid value '{value}' in column {column} on line {line}")
+
+# Convert the columns of df that are in the schema, other columns are left as they are
+# Without categories, category columns stay text, for chunks that are combined later
+def apply_schema(df, schema, categories=True):
+    types = {column: dtype for column, dtype in schema.items()
+             if column in df.columns and df[column].dtype != dtype and (categories or dtype != 'category')}
+    if not types:
+        return df
+    return df.astype(types)
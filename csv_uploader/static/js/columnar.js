@@ -0,0 +1,74 @@
+// Tables requested with format: 'columnar' come as {columns, types, data}, with one array of values per column
+// These helpers turn them into a DataTable without building the whole table as HTML first
+
+function escapeHtml(text) {
+  return String(text)
+    .replace(/&/g, '&amp;')
+    .replace(/</g, '&lt;')
+    .replace(/>/g, '&gt;')
+    .replace(/"/g, '&quot;');
+}
+
+// Header row of the table, to put in the <table> before the DataTable is created
+function columnarHead(table) {
+  let headerHtml = '<thead><tr>';
+  table.columns.forEach(function (name) {
+    headerHtml += `<th>${escapeHtml(name)}</th>`;
+  });
+  return headerHtml + '</tr></thead>';
+}
+
+// Rows for the data option of a DataTable, values are shown like the HTML tables show them
+// (True and False for booleans, an empty cell for missing values)
+function columnarRows(table) {
+  const columns = table.data.map(function (values, index) {
+    const type = table.types[index];
+    return values.map(function (value) {
+      if (value === null) {
+        return '';
+      }
+      if (type === 'boolean') {
+        return value ? 'True' : 'False';
+      }
+      return type === 'string' ? escapeHtml(value) : value;
+    });
+  });
+
+  const rowCount = columns.length ? columns[0].length : 0;
+  const rows = new Array(rowCount);
+  for (let row = 0; row < rowCount; row++) {
+    rows[row] = columns.map(function (values) {
+      return values[row];
+    });
+  }
+  return rows;
+}
+
+// Table responses of this page with their ETag, by request
+const tableResponses = {};
+
+// $.ajax for the table routes: asking for the same table again sends the ETag of the response that was received,
+// and when the table didn't change the server answers 304 Not Modified and the response that was received is used again
+function tableRequest(settings) {
+  const key = `${settings.type} ${settings.url} ${settings.data || ''}`;
+  const received = tableResponses[key];
+  const success = settings.success;
+
+  return $.ajax(
+    Object.assign({}, settings, {
+      headers: received ? { 'If-None-Match': received.etag } : {},
+      success: function (response, status, xhr) {
+        if (xhr.status === 304 && received) {
+          success(received.response, status, xhr);
+          return;
+        }
+
+        const etag = xhr.getResponseHeader('ETag');
+        if (etag) {
+          tableResponses[key] = { etag: etag, response: response };
+        }
+        success(response, status, xhr);
+      },
+    })
+  );
+}
@@ -0,0 +1,69 @@
+import io
+import os
+import pandas as pd # type: ignore
+import pyarrow as pa # type: ignore
+import pyarrow.feather as feather # type: ignore
+import pyarrow.parquet as pq # type: ignore
+from metrics import phase
+
+# Every Parquet file starts with these bytes, anything else in the database is a legacy CSV blob
+PARQUET_MAGIC = b'PAR1'
+
+# Stored blobs are compressed with zstd, on top of Parquet's own dictionary encoding of repeated values
+COMPRESSION = 'zstd'
+COMPRESSION_LEVEL = 9
+
+# Serialize a semester DataFrame into the blob stored in AttendanceFile
+def encode_semester(df):
+    buffer = io.BytesIO()
+    df.to_parquet(buffer, index=False, compression=COMPRESSION, compression_level=COMPRESSION_LEVEL)
+    return buffer.getvalue()
+
+# Load a stored semester blob, only reading the requested columns
+def decode_semester(blob, columns=None):
+    if blob[:4] == PARQUET_MAGIC:
+        return pd.read_parquet(io.BytesIO(blob), columns=columns)
+
+    # Semesters uploaded before the switch to Parquet were stored as semicolon separated CSV text
+    return pd.read_csv(io.BytesIO(blob), delimiter=";", encoding="utf-8", usecols=columns)
+
+# Builds a stored semester blob one DataFrame chunk at a time, so the whole semester never has to be in memory
+class SemesterWriter:
+    def __init__(self):
+        self.buffer = io.BytesIO()
+        self.writer = None
+
+    def write(self, df):
+        # Every chunk is written with the column types of the first one
+        if self.writer is None:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            self.writer = pq.ParquetWriter(self.buffer, table.schema, compression=COMPRESSION, compression_level=COMPRESSION_LEVEL)
+        else:
+            table = pa.Table.from_pandas(df, schema=self.writer.schema, preserve_index=False)
+
+        self.writer.write_table(table)
+
+    def finish(self):
+        self.writer.close()
+        return self.buffer.getvalue()
+
+# Write a workspace frame as an uncompressed Arrow IPC (Feather) file, which readers memory map instead of parsing
+# The file only appears under its name once it is complete, so a reader never sees half of it
+# Writing the file is timed as io, inside the caller's serialize phase
+def write_frame(df, path):
+    table = pa.Table.from_pandas(df)
+    partial = f"{path}.partial"
+
+    with phase('io'):
+        feather.write_feather(table, partial, compression='uncompressed')
+        os.replace(partial, path)
+
+# Load a frame written by write_frame, with those of columns that the frame has
+# The file is memory mapped without copying, so the columns that aren't converted are never read from disk
+# Mapping the file is timed as io, inside the caller's decode phase, the pages are read when to_pandas touches them
+def read_frame(path, columns=None):
+    with phase('io'):
+        table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+    if columns is not None:
+        table = table.select([column for column in columns if column in table.column_names])
+    return table.to_pandas()
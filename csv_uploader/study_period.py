@@ -0,0 +1,162 @@
+import numpy as np # type: ignore
+import pandas as pd # type: ignore
+from jobs import no_progress
+from terms import add_3_years, add_1_semester, term_code, term_parts, MISSING_TERM
+
+# Add the max study period columns, with and without extensions, to the BBS data
+def add_extended_columns(df):
+    # Calculate the max study period for no extensions
+    df['BASE MAX STUDY PERIOD'] = add_3_years(df['ADMIT TERM'])
+    df['BASE MAX STUDY PERIOD (PDPT)'] = add_3_years(df['INTAKE PDPT'])
+
+    # Calculate the max study period for 1 extension
+    df['MAX STUDY PERIOD 1 EXTEND'] = add_1_semester(df['BASE MAX STUDY PERIOD'])
+    df['MAX STUDY PERIOD 1 EXTEND (PDPT)'] = add_1_semester(df['BASE MAX STUDY PERIOD (PDPT)'])
+
+    # Calculate the max study period for 2 extensions
+    df['MAX STUDY PERIOD 2 EXTEND'] = add_1_semester(df['MAX STUDY PERIOD 1 EXTEND'])
+    df['MAX STUDY PERIOD 2 EXTEND (PDPT)'] = add_1_semester(df['MAX STUDY PERIOD 1 EXTEND (PDPT)'])
+
+    return df
+
+# Find the students of the extended BBS data that need an action in the given year, semester and period
+# report is called with the fraction of the work done so far, for background jobs
+def find_students_to_extend(df, year, semester, period, report=no_progress):
+    # Construct the term codes to compare with max study period
+    term_to_match = term_code(int(year), int(semester), int(period))
+    term_to_match_pdpt = term_code(int(year), int(semester), 0)
+
+    # Filter out unimportant columns
+    df_trimmed = df[['EXTERNAL SYSTEM ID', 'BINUSIAN ID', 'FULL NAME', 'ACAD PROG', 'PROG STATUS', 
+                     'ADMIT TERM', 'INTAKE PDPT', 'STUDENT TYPE','TOTAL SCU (LAST TERM)', 
+                     'BASE MAX STUDY PERIOD', 'BASE MAX STUDY PERIOD (PDPT)', 
+                     'MAX STUDY PERIOD 1 EXTEND', 'MAX STUDY PERIOD 1 EXTEND (PDPT)',
+                     'MAX STUDY PERIOD 2 EXTEND', 'MAX STUDY PERIOD 2 EXTEND (PDPT)']]
+
+    # Get series of all SCU, but convert to numeric by replacing "-" with NaN
+    scu_numeric = pd.to_numeric(df_trimmed['TOTAL SCU (LAST TERM)'].replace("-", np.nan), errors='coerce')
+
+    # Boolean to check rows that has PDPT and rows with LA students
+    has_pdpt = df_trimmed['INTAKE PDPT'] != MISSING_TERM
+    is_la = df_trimmed['PROG STATUS'] == 'LA'
+
+    # Getting the specific period of their admit term
+    intake_periods = pd.Series(term_parts(df_trimmed['ADMIT TERM'])[2], index=df_trimmed.index)
+
+
+    # Create a series to determine how much each value needs to be deducted, which is the missed potential SCU
+    deduction_conditions = [
+        (has_pdpt) & (is_la) & (scu_numeric < 42) & (period == 1),
+        (has_pdpt) & (is_la) & (scu_numeric < 42) & (period == 2),
+        (~has_pdpt) & (is_la) & (scu_numeric < 42) & (abs(intake_periods - period) == 1),
+        (~has_pdpt) & (is_la) & (scu_numeric < 42) & (abs(intake_periods - period) == 0)
+    ]
+
+    deduction_values = [16, 8, 8, 16]
+
+    # Apply deductions
+    deductions = np.select(deduction_conditions, deduction_values, default=0)
+
+    # New series with deducted SCUs
+    scu_deducted = scu_numeric - deductions
+
+    report(0.3)
+
+    # Aliases to shorten the upcoming conditions
+    pdpt_0 = df_trimmed['BASE MAX STUDY PERIOD (PDPT)']
+    pdpt_1 = df_trimmed['MAX STUDY PERIOD 1 EXTEND (PDPT)']
+    pdpt_2 = df_trimmed['MAX STUDY PERIOD 2 EXTEND (PDPT)']
+    base_0 = df_trimmed['BASE MAX STUDY PERIOD']
+    base_1 = df_trimmed['MAX STUDY PERIOD 1 EXTEND']
+    base_2 = df_trimmed['MAX STUDY PERIOD 2 EXTEND']
+    is_period_1 = (period == 1)
+    is_period_2 = (period == 2)
+
+    all_conditions = [
+        # PDPT conditions
+        # Student with more than 42 SCU, and have PDPT
+        (has_pdpt) & (scu_deducted >= 42) & ((pdpt_0 == term_to_match_pdpt) | (pdpt_1 == term_to_match_pdpt) | (pdpt_2 == term_to_match_pdpt)),
+        # Base PDPT is the current period, the current period is 1, and SCU < -6
+        (has_pdpt) & (pdpt_0 == term_to_match_pdpt) & (is_period_1) & (scu_deducted < -6),
+        # Base PDPT is the current period, the current period is 2, and SCU < 2
+        (has_pdpt) & (pdpt_0 == term_to_match_pdpt) & (is_period_2) & (scu_deducted < 2),
+        # Base PDPT is the current period
+        (has_pdpt) & (pdpt_0 == term_to_match_pdpt),
+
+        # 1 Extend PDPT is the current period, the current period is 1, and SCU < 10
+        (has_pdpt) & (pdpt_1 == term_to_match_pdpt) & (is_period_1) * (scu_deducted < 10),
+        # 1 Extend PDPT is the current period, the current period is 2, and SCU < 18
+        (has_pdpt) & (pdpt_1 == term_to_match_pdpt) & (is_period_2) * (scu_deducted < 18),
+        # 1 Extend PDPT is the current period
+        (has_pdpt) & (pdpt_1 == term_to_match_pdpt),
+
+        # 2 Extend PDPT is the current period, the current period is 1, and SCU < 26
+        (has_pdpt) & (pdpt_2 == term_to_match_pdpt) & (is_period_1) & (scu_deducted < 26),
+        # 2 Extend PDPT is the current period, the current period is 2, and SCU < 34
+        (has_pdpt) & (pdpt_2 == term_to_match_pdpt) & (is_period_2) & (scu_deducted < 34),
+        # 2 Extend PDPT is the current period
+        (has_pdpt) & (pdpt_2 == term_to_match_pdpt),
+
+        # BINUS conditions
+        # Student with more than 42 SCU, but no PDPT
+        (~has_pdpt) & (scu_deducted >= 42) & ((base_0 == term_to_match) | (base_1 == term_to_match) | (base_2 == term_to_match)),
+        # Base is the current period, and SCU < 2
+        (~has_pdpt) & (base_0 == term_to_match) & (scu_deducted < 2),
+        # Base is the current period
+        (~has_pdpt) & (base_0 == term_to_match),
+
+        # 1 Extend is the current period, and scu < 18
+        (~has_pdpt) & (base_1 == term_to_match) & (scu_deducted < 18),
+        # 1 Extend is the current period
+        (~has_pdpt) & (base_1 == term_to_match),
+
+        # 2 Extend is the current period, and scu < 34
+        (~has_pdpt) & (base_2 == term_to_match) & (scu_deducted < 34),
+        # 2 Extend is the current period
+        (~has_pdpt) & (base_2 == term_to_match)
+    ]
+
+    all_actions = [
+        'Confirm with operation (PDPT)',
+        'Recommend for resignation',
+        'Recommend for resignation',
+        '1st Extension',
+        'Recommend for resignation',
+        'Recommend for resignation',
+        '2nd Extension',
+        'Add to DO list',
+        'Add to DO list',
+        'DO depends on SCU in this period',
+        'Confirm with operation (No PDPT)',
+        'Recommend for resignation (confirm with operation)',
+        '1st Extension (confirm with operation)',
+        'Recommend for resignation (confirm with operation)',
+        '2nd Extension (confirm with operation)',
+        'Add to DO list (confirm with operation)',
+        'DO depends on SCU in this period (confirm with operation)'
+    ]
+
+    report(0.6)
+
+    # To remove settingwithcopy warning
+    df_trimmed = df_trimmed.copy()
+
+    # Populate ACTION column
+    df_trimmed.loc[:, 'ACTION'] = np.select(all_conditions, all_actions, default=None)
+
+    report(0.9)
+
+    df_filtered = df_trimmed[df_trimmed['ACTION'].notna()]
+
+    return df_filtered
+
+# Extended BBS data, run directly or as a background job
+def extended_columns_job(report, bbs_data):
+    # add_extended_columns adds to the frame it is given, the workspace copy stays as uploaded
+    df = add_extended_columns(bbs_data.copy())
+    report(0.8)
+    return df
+
+# Student list of the extended BBS data, run directly or as a background job
+def student_list_job(report, year, semester, period, bbs_extended):
+    return find_students_to_extend(bbs_extended, year, semester, period, report)
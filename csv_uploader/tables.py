@@ -0,0 +1,141 @@
+import re
+import json
+import numpy as np # type: ignore
+import pandas as pd # type: ignore
+from flask import Response # type: ignore
+from metrics import phase, jsonify
+
+# Server side processing for DataTables (https://datatables.net/manual/server-side)
+# Paging, sorting and searching are done on the DataFrame so only the visible page is sent to the browser
+
+# Read the DataTables parameters of a request, either sent as JSON or in DataTables' default form encoding
+def datatables_params(request):
+    if request.is_json:
+        return request.get_json(silent=True) or {}
+
+    # Form encoded keys look like columns[0][search][value], turn them into nested dictionaries
+    params = {}
+    for key, value in request.values.items():
+        parts = re.findall(r'[^\[\]]+', key)
+        node = params
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = value
+
+    return params
+
+# A request only wants server side processing if it came from a serverSide DataTable
+def is_server_side_request(params):
+    return params is not None and 'draw' in params
+
+# Arrays become a dictionary of position to value, form encoded arrays already come in with '0', '1', ... keys
+def as_indexed(value):
+    if isinstance(value, dict):
+        return {int(key): item for key, item in value.items()}
+    return dict(enumerate(value or []))
+
+def as_bool(value):
+    return value is True or value == 'true'
+
+# Boolean mask of rows where the column contains the search term, like DataTables' own search
+def search_mask(column, term, regex=False):
+    text = column.astype(str)
+    return text.str.contains(term, case=False, regex=regex, na=False).to_numpy()
+
+# Apply a DataTables request to the DataFrame and return the response for the visible page
+def datatables_page(df, params):
+    records_total = len(df)
+    columns = as_indexed(params.get('columns'))
+
+    # Columns sent by the browser are matched by position, columns it didn't describe are searchable
+    searchable = [name for i, name in enumerate(df.columns) if as_bool(columns.get(i, {}).get('searchable', True))]
+
+    mask = np.ones(records_total, dtype=bool)
+
+    # Global search, every word has to appear in at least one searchable column
+    search = params.get('search') or {}
+    search_value = str(search.get('value', '')).strip()
+    if search_value:
+        if as_bool(search.get('regex')):
+            words = [search_value]
+        else:
+            words = search_value.split()
+
+        for word in words:
+            word_mask = np.zeros(records_total, dtype=bool)
+            for name in searchable:
+                word_mask |= search_mask(df[name], word, as_bool(search.get('regex')))
+            mask &= word_mask
+
+    # Individual column filters
+    for i, column in columns.items():
+        if i >= len(df.columns):
+            continue
+
+        column_search = column.get('search') or {}
+        column_value = str(column_search.get('value', '')).strip()
+        if column_value:
+            mask &= search_mask(df.iloc[:, i], column_value, as_bool(column_search.get('regex')))
+
+    filtered = df[mask]
+
+    # Sorting, a stable sort keeps the original order between equal values
+    sort_by = []
+    ascending = []
+    orders = as_indexed(params.get('order'))
+    for position in sorted(orders):
+        order = orders[position]
+        index = int(order.get('column', 0))
+        if index < len(df.columns) and as_bool(columns.get(index, {}).get('orderable', True)):
+            sort_by.append(df.columns[index])
+            ascending.append(order.get('dir', 'asc') != 'desc')
+
+    if sort_by:
+        filtered = filtered.sort_values(by=sort_by, ascending=ascending, kind='mergesort')
+
+    # Paging, a length of -1 means all rows
+    start = int(params.get('start', 0))
+    length = int(params.get('length', 10))
+    page = filtered.iloc[start:] if length < 0 else filtered.iloc[start:start + length]
+
+    with phase('serialize'):
+        # to_json converts NumPy values and NaN into plain JSON values
+        data = json.loads(page.to_json(orient='values'))
+
+    return {
+        'draw': int(params.get('draw', 0)),
+        'recordsTotal': records_total,
+        'recordsFiltered': len(filtered),
+        'columns': list(df.columns),
+        'data': data
+    }
+
+# Whole table as HTML, for DataTables that don't use server side processing
+def html_table(df):
+    with phase('serialize'):
+        return df.to_html(classes='table table-striped', index=False)
+
+# Type of a column in a columnar table, so the page can sort and format it without guessing
+def column_type(column):
+    if pd.api.types.is_bool_dtype(column):
+        return 'boolean'
+    if pd.api.types.is_integer_dtype(column):
+        return 'integer'
+    if pd.api.types.is_float_dtype(column):
+        return 'number'
+    return 'string'
+
+# Whole table as JSON text with one array per column: {"columns": [...], "types": [...], "data": [[column 0 values], ...]}
+# Every column is written by to_json on its own and joined, so the table is never turned into Python objects
+def columnar_table(df):
+    with phase('serialize'):
+        arrays = [df.iloc[:, i].to_json(orient='values') for i in range(len(df.columns))]
+        return (f'{{"columns":{json.dumps([str(name) for name in df.columns])},'
+                f'"types":{json.dumps([column_type(df.iloc[:, i]) for i in range(len(df.columns))])},'
+                f'"data":[{",".join(arrays)}]}}')
+
+# Whole table in the format the page asked for, {'data': <HTML table>} by default or a columnar table with format=columnar
+def table_response(df, params):
+    if (params or {}).get('format') == 'columnar':
+        return Response(columnar_table(df), mimetype='application/json')
+    return jsonify({'data': html_table(df)})
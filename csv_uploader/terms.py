@@ -0,0 +1,94 @@
+import numpy as np # type: ignore
+import pandas as pd # type: ignore
+
+# Academic terms are stored as integer codes, year * 100 + semester * 10 + period, with a two digit year
+# BINUS terms use period 1 or 2 (19.12 is 1912), PDPT terms period 0 (19.10 is 1910)
+# An empty cell is stored as 0 and shown as "-"
+MISSING_TERM = 0
+
+# Columns of the BBS files that hold term codes
+TERM_COLUMNS = ['ADMIT TERM', 'INTAKE PDPT',
+                'BASE MAX STUDY PERIOD', 'BASE MAX STUDY PERIOD (PDPT)',
+                'MAX STUDY PERIOD 1 EXTEND', 'MAX STUDY PERIOD 1 EXTEND (PDPT)',
+                'MAX STUDY PERIOD 2 EXTEND', 'MAX STUDY PERIOD 2 EXTEND (PDPT)']
+
+def term_code(year, semester, period):
+    return year * 100 + semester * 10 + period
+
+# Split term codes into year, semester and period arrays
+def term_parts(codes):
+    codes = np.asarray(codes, dtype=np.int64)
+    return codes // 100, (codes // 10) % 10, codes % 10
+
+# Numeric column with empty cells to integer array, empty cells become 0
+def to_codes(values):
+    return pd.to_numeric(values, errors='coerce').fillna(MISSING_TERM).astype(np.int64).to_numpy()
+
+# BINUS terms come in as two digit year, semester and period (1912), which already is the term code
+def binus_term_codes(values):
+    return to_codes(values)
+
+# PDPT terms come in as year and semester digits (20191), only the last two digits of the year are kept
+def pdpt_term_codes(values):
+    codes = to_codes(values)
+    return np.where(codes == MISSING_TERM, MISSING_TERM, term_code((codes // 10) % 100, codes % 10, 0))
+
+# Latest term a student can study in without extensions
+def add_3_years(codes):
+    year, semester, period = term_parts(codes)
+
+    year = year + 3
+
+    # Period 2 (only in BINUS terms) goes back to period 1 of the same semester
+    is_period_2 = period == 2
+
+    # Otherwise go back a semester, moving to the previous year when leaving semester 1
+    is_semester_1 = semester == 1
+    new_year = np.where(is_period_2, year, np.where(is_semester_1, year - 1, year))
+    new_semester = np.where(is_period_2, semester, np.where(is_semester_1, 2, 1))
+
+    # PDPT terms stay period 0, a BINUS period 1 becomes period 2
+    new_period = np.where(is_period_2, 1, np.where(period == 0, 0, 2))
+
+    return np.where(np.asarray(codes) == MISSING_TERM, MISSING_TERM, term_code(new_year, new_semester, new_period))
+
+# The term one semester later, keeping the period
+def add_1_semester(codes):
+    year, semester, period = term_parts(codes)
+
+    is_semester_1 = semester == 1
+    new_year = np.where(is_semester_1, year, year + 1)
+    new_semester = np.where(is_semester_1, 2, 1)
+
+    return np.where(np.asarray(codes) == MISSING_TERM, MISSING_TERM, term_code(new_year, new_semester, period))
+
+# Term codes to the year.semesterperiod text shown in the tables
+def format_terms(codes, index=None):
+    codes = np.asarray(codes, dtype=np.int64)
+    year, semester, period = term_parts(codes)
+
+    text = (
+        pd.Series(year, index=index).astype(str) + '.' +
+        pd.Series(semester, index=index).astype(str) +
+        pd.Series(period, index=index).astype(str)
+    )
+    return text.where(codes != MISSING_TERM, "-")
+
+# Copy of a BBS DataFrame with its term code columns turned into text for display
+def format_term_columns(df):
+    df = df.copy()
+    for column in TERM_COLUMNS:
+        if column in df.columns:
+            df[column] = format_terms(df[column], df.index)
+    return df
+
+def student_type_capitalization(values):
+    student_types = {'regular': 'Regular', 'master_track': 'Master track', 'fast_track': 'Fast track'}
+
+    # Anything else is RPL
+    return values.map(student_types).fillna('RPL')
+
+# Whole number of SCU, "-" when empty
+def scu_formatter(values):
+    numbers = pd.to_numeric(values, errors='coerce')
+    return numbers.fillna(0).astype(np.int64).astype(str).where(numbers.notna(), "-")
@@ -0,0 +1,17 @@
+import os
+import sys
+import pytest # type: ignore
+
+# The app's modules import each other by name, like when app.py is run from csv_uploader
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, init_app
+
+# An app on a scratch database and workspace folder
+@pytest.fixture
+def app(tmp_path):
+    return init_app(create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'attendance.db'}",
+        'WORKSPACE_FOLDER': str(tmp_path / 'workspaces'),
+        'SECRET_KEY': 'test'
+    }))
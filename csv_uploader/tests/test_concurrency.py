@@ -0,0 +1,62 @@
+import time
+import multiprocessing
+from models import generate_students, generate_attendance, attendance_file_name, write_export
+from app import create_app, init_app
+
+# A dashboard read must never wait for an upload to commit, well below the busy timeout it would otherwise wait
+MAX_READ_SECONDS = 2
+
+def upload(client, path):
+    with open(path, 'rb') as file:
+        return client.post('/upload', data={'file': (file, path.name)}, content_type='multipart/form-data').get_json()
+
+# Uploads from another web process, each written and committed while the test reads
+def upload_all(config, paths, started, errors):
+    client = init_app(create_app(config)).test_client()
+    started.set()
+    for path in paths:
+        result = upload(client, path)
+        if 'success' not in result:
+            errors.append(result)
+
+# Reads of the dashboard go on while another process uploads semesters
+def test_reads_during_uploads(app, tmp_path):
+    students = generate_students(3000)
+
+    read_path = tmp_path / attendance_file_name(11, 10, 2015)
+    write_export(generate_attendance(students, 4, strm='1510'), read_path)
+    assert 'success' in upload(app.test_client(), read_path)
+
+    paths = []
+    for i, (month, year) in enumerate([(10, 2016), (3, 2017), (10, 2017), (3, 2018)]):
+        path = tmp_path / attendance_file_name(11, month, year)
+        write_export(generate_attendance(students, 8, semester=i), path)
+        paths.append(path)
+
+    context = multiprocessing.get_context('fork')
+    with context.Manager() as manager:
+        started = manager.Event()
+        errors = manager.list()
+        uploader = context.Process(target=upload_all, args=(app.config, paths, started, errors))
+        uploader.start()
+        started.wait()
+
+        client = app.test_client()
+        latencies = []
+        failures = []
+        while uploader.is_alive():
+            for method, url, json in [('post', '/retrieve', {'year': 2015, 'semester_type': 'Odd'}), ('get', '/list_uploaded_files', None)]:
+                start = time.perf_counter()
+                response = getattr(client, method)(url, json=json)
+                latencies.append(time.perf_counter() - start)
+
+                if response.status_code != 200 or 'error' in response.get_json():
+                    failures.append(response.get_data(as_text=True))
+
+        uploader.join()
+        assert list(errors) == []
+
+    assert not any('database is locked' in failure for failure in failures)
+    assert failures == []
+    assert len(latencies) > 2
+    assert max(latencies) < MAX_READ_SECONDS
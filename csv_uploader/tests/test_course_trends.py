@@ -0,0 +1,22 @@
+import pytest # type: ignore
+
+PARAMS = {'courses': ['COMP6001'], 'components': ['LEC/LAB'], 'value': 'count', 'semester_count': 4, 'threshold': 0, 'divisor': 'Max'}
+
+# Missing or malformed parameters get a 400 with a message, not a server error
+@pytest.mark.parametrize('change', [
+    {'components': None},
+    {'components': 'LEC'},
+    {'components': []},
+    {'courses': 'COMP6001'},
+    {'courses': None},
+    {'divisor': 'Total'}
+])
+def test_courses_data_rejects_bad_parameters(app, change):
+    params = {name: value for name, value in {**PARAMS, **change}.items() if value is not None}
+    response = app.test_client().post('/get_bar_chart_courses_data', json=params)
+    assert response.status_code == 400
+    assert response.get_json()['error']
+
+def test_courses_data_without_body(app):
+    response = app.test_client().post('/get_bar_chart_courses_data')
+    assert response.status_code == 400
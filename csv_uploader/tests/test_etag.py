@@ -0,0 +1,33 @@
+from models import generate_students, generate_attendance, attendance_file_name, write_export
+
+# A table cached in one encoding must not be taken as current by a request that gets another encoding
+def test_etag_matches_only_its_encoding(app, tmp_path):
+    path = tmp_path / attendance_file_name(11, 10, 2016)
+    write_export(generate_attendance(generate_students(300), 6, strm='1610'), path)
+
+    client = app.test_client()
+    with open(path, 'rb') as file:
+        assert 'success' in client.post('/upload', data={'file': (file, path.name)}, content_type='multipart/form-data').get_json()
+    assert 'success' in client.post('/aggregate_tables', json={}).get_json()
+
+    def get(encoding, etag=None):
+        headers = {'Accept-Encoding': encoding}
+        if etag is not None:
+            headers['If-None-Match'] = f'"{etag}"'
+        return client.post('/get_nim_course_aggregate', json={}, headers=headers)
+
+    gzipped = get('gzip')
+    assert gzipped.status_code == 200 and gzipped.headers['Content-Encoding'] == 'gzip'
+    gzip_etag = gzipped.get_etag()[0]
+    assert gzip_etag.endswith('-gzip')
+
+    plain = get('identity')
+    assert plain.status_code == 200 and 'Content-Encoding' not in plain.headers
+    plain_etag = plain.get_etag()[0]
+
+    assert get('gzip', gzip_etag).status_code == 304
+    assert get('identity', plain_etag).status_code == 304
+
+    # The tag of the other encoding is another representation
+    assert get('identity', gzip_etag).status_code == 200
+    assert get('gzip', plain_etag).status_code == 200
@@ -0,0 +1,41 @@
+import time
+from jobs import JobManager
+from database import JobStore
+
+# Reports its progress a hundred times over about five seconds
+def slow_job(report):
+    for i in range(100):
+        report(i / 100)
+        time.sleep(0.05)
+    return 'finished'
+
+def wait_for(manager, job_id, states, timeout=20):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = manager.status(job_id)
+        if status['state'] in states:
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f"job stayed {manager.status(job_id)['state']}")
+
+def test_running_job_can_be_cancelled(app):
+    manager = JobManager(1, JobStore(app))
+    results = []
+    job_id = manager.submit('owner', 'slow', slow_job, [], results.append)
+
+    running = wait_for(manager, job_id, ['running'])
+    assert 0 <= running['progress'] < 1
+
+    # The store is kept up to date by the sync thread, other web processes see the job running
+    time.sleep(0.5)
+    assert manager.store.get(job_id)['state'] == 'running'
+
+    assert manager.cancel(job_id)
+
+    # The pool process stops at its next report, long before the job would have finished
+    deadline = time.time() + 2
+    while job_id in manager.jobs and time.time() < deadline:
+        time.sleep(0.05)
+    assert job_id not in manager.jobs
+    assert manager.store.get(job_id)['state'] == 'cancelled'
+    assert results == []
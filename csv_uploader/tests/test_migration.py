@@ -0,0 +1,46 @@
+import sqlite3
+import multiprocessing
+from app import create_app, init_app
+
+OLD_COLUMNS = [('attendance_file', 'content_hash'), ('attendance_file', 'row_count'), ('attendance_file', 'column_names'),
+               ('workspace_frame', 'source_hash')]
+
+def set_up(config, barrier, errors):
+    app = create_app(config)
+    barrier.wait()
+    try:
+        init_app(app)
+    except Exception as error:
+        errors.append(repr(error))
+
+# Web processes starting at the same time on a database of an older version must add each column once
+def test_concurrent_migration(tmp_path):
+    config = {
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'attendance.db'}",
+        'WORKSPACE_FOLDER': str(tmp_path / 'workspaces'),
+        'SECRET_KEY': 'test'
+    }
+    init_app(create_app(config))
+
+    connection = sqlite3.connect(tmp_path / 'attendance.db')
+    for table, column in OLD_COLUMNS:
+        connection.execute(f"ALTER TABLE {table} DROP COLUMN {column}")
+    connection.commit()
+    connection.close()
+
+    context = multiprocessing.get_context('fork')
+    with context.Manager() as manager:
+        errors = manager.list()
+        barrier = context.Barrier(6)
+        processes = [context.Process(target=set_up, args=(config, barrier, errors)) for _ in range(6)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        assert list(errors) == []
+
+    connection = sqlite3.connect(tmp_path / 'attendance.db')
+    for table, column in OLD_COLUMNS:
+        assert column in [row[1] for row in connection.execute(f"PRAGMA table_info({table})")]
+    connection.close()
@@ -0,0 +1,60 @@
+import pandas as pd # type: ignore
+from models import generate_students, generate_attendance, attendance_file_name, write_export
+from app import load_semester, load_semester_tables
+from database import AttendanceFile
+from aggregation import aggregate_attendance
+from jobs import no_progress
+
+def upload(client, path):
+    with open(path, 'rb') as file:
+        return client.post('/upload', data={'file': (file, path.name)}, content_type='multipart/form-data').get_json()
+
+# Stored tables of the semester must always be the tables of its stored data
+def assert_stored_tables_current(app):
+    with app.app_context():
+        entry = AttendanceFile.query.filter_by(year=2016, semester_type='Odd').one()
+        stored = load_semester_tables(entry.id, entry.content_hash)
+        assert stored is not None
+
+        nim_course, grouped_nim = aggregate_attendance(load_semester(entry).copy(), no_progress)
+        pd.testing.assert_frame_equal(stored[0].reset_index(drop=True), nim_course.reset_index(drop=True), check_categorical=False)
+        pd.testing.assert_frame_equal(stored[1].reset_index(drop=True), grouped_nim.reset_index(drop=True), check_categorical=False)
+        return stored
+
+# A session aggregating a snapshot that another session replaced meanwhile must not store its tables for the new snapshot
+def test_tables_after_concurrent_replace(app, tmp_path):
+    students = generate_students(300)
+    first = generate_attendance(students, 6, strm='1610')
+    path_first = tmp_path / attendance_file_name(11, 10, 2016)
+    write_export(first, path_first)
+
+    # The newer snapshot has every row over the absence limit
+    second = first.copy()
+    second['TOTAL ABSENCE'] = second['MAX ABSENCE'] + 1
+    second['SESSION DONE'] = second['TOTAL SESSION']
+    path_second = tmp_path / attendance_file_name(18, 10, 2016)
+    write_export(second, path_second)
+
+    a, b, c = app.test_client(), app.test_client(), app.test_client()
+
+    assert 'success' in upload(a, path_first)
+    assert 'success' in a.post('/aggregate_tables', json={}).get_json()
+    assert_stored_tables_current(app)
+
+    # b replaces the semester while a still works on the first snapshot, the stored tables are patched
+    assert 'success' in upload(b, path_second)
+    assert_stored_tables_current(app)
+
+    # a aggregates its own, older data
+    assert 'success' in a.post('/aggregate_tables', json={}).get_json()
+    a_tables = a.post('/get_nim_course_aggregate', json={'format': 'columnar'}).get_json()
+    assert any(a_tables['data'][a_tables['columns'].index('ELIGIBLE')])
+
+    stored = assert_stored_tables_current(app)
+    assert not stored[0]['ELIGIBLE'].any()
+
+    # A new session gets the tables of the stored snapshot
+    assert 'success' in c.post('/retrieve', json={'year': 2016, 'semester_type': 'Odd'}).get_json()
+    assert 'success' in c.post('/aggregate_tables', json={}).get_json()
+    c_tables = c.post('/get_nim_course_aggregate', json={'format': 'columnar'}).get_json()
+    assert not any(c_tables['data'][c_tables['columns'].index('ELIGIBLE')])
@@ -0,0 +1,234 @@
+import os
+import time
+import uuid
+import pickle
+import shutil
+import threading
+from collections import OrderedDict
+from database import db, WorkspaceRecord, WorkspaceFrame
+from metrics import phase, count_rows
+from lazy import lazy_import
+
+# Loaded by the first frame that is stored or read, like in app.py
+storage = lazy_import('storage')
+
+# Seconds between updates of the last use of a workspace, so using a workspace doesn't write to the database on every request
+TOUCH_SECONDS = 60
+
+# Working DataFrames of one session (the loaded semester, the BBS list and everything calculated from them)
+# Frames are Arrow IPC files in the workspace folder, listed in the database with their version, so every web process
+# of the app sees the same workspace. Readers memory map the files and only convert the columns they use.
+class Workspace:
+    def __init__(self, store, workspace_id):
+        self.store = store
+        self.id = workspace_id
+
+    def frames(self):
+        return WorkspaceFrame.query.filter_by(workspace_id=self.id)
+
+    # Store a frame under a name, label is the file name shown to the browser (defaults to <name>.csv)
+    # and source what it was loaded from, like the id of a stored semester, with the content_hash it had then
+    def put(self, name, df, label=None, source=None, source_hash=None):
+        version = uuid.uuid4().hex
+        path = self.store.path(self.id, name, version)
+
+        with phase('serialize'):
+            data = None
+
+            # Arrow files lose the categories of empty frames, those are small enough for the database row anyway
+            if len(df):
+                try:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    storage.write_frame(df, path)
+                    data, size = b'', os.path.getsize(path)
+                except (ValueError, TypeError, NotImplementedError):
+                    # Frames Arrow can't hold, like columns of mixed Python objects, are pickled into the database row as well
+                    pass
+
+            if data is None:
+                data = pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL)
+                size = len(data)
+
+        # A replaced frame is listed last, like a new one
+        old_version = self.version(name)
+        self.frames().filter_by(name=name).delete()
+
+        frame = WorkspaceFrame(workspace_id=self.id, name=name, label=label or f"{name}.csv", source=source,
+                               source_hash=source_hash, version=version, size=size, data=data)
+        db.session.add(frame)
+        db.session.commit()
+
+        if old_version is not None:
+            self.store.discard(self.id, name, old_version)
+        self.store.remember(self.id, name, version, df)
+
+    # columns, when given, only loads those of the columns that the frame has, the rest of its file is never read
+    def get(self, name, columns=None):
+        version = self.version(name)
+        if version is None:
+            return None
+
+        # The copy in memory is only used while it is the stored version, another web process may have replaced it
+        df = self.store.recall(self.id, name, version)
+        if df is not None and columns is not None:
+            df = df[[column for column in columns if column in df.columns]]
+        elif df is None:
+            try:
+                df = self.load(name, version, columns)
+            except FileNotFoundError:
+                # Another web process replaced the frame and removed the old file after its version was looked up
+                if self.version(name) == version:
+                    raise
+                return self.get(name, columns)
+
+            # Only whole frames are kept in memory
+            if columns is None:
+                self.store.remember(self.id, name, version, df)
+
+        count_rows(df)
+        return df
+
+    # Read a stored version of a frame from its file, or from the database row for pickled frames
+    def load(self, name, version, columns):
+        data = self.frames().filter_by(name=name, version=version).with_entities(WorkspaceFrame.data).scalar()
+        if data is None:
+            raise FileNotFoundError(f"{name} was replaced")
+
+        with phase('decode'):
+            if data:
+                df = pickle.loads(data)
+                return df if columns is None else df[[column for column in columns if column in df.columns]]
+
+            return storage.read_frame(self.store.path(self.id, name, version), columns)
+
+    # Version of the stored frame, changes every time it is replaced, None when there is no such frame
+    def version(self, name):
+        return self.frames().filter_by(name=name).with_entities(WorkspaceFrame.version).scalar()
+
+    def remove(self, *names):
+        versions = self.frames().filter(WorkspaceFrame.name.in_(names)).with_entities(WorkspaceFrame.name, WorkspaceFrame.version).all()
+        self.frames().filter(WorkspaceFrame.name.in_(names)).delete(synchronize_session=False)
+        db.session.commit()
+
+        for name, version in versions:
+            self.store.discard(self.id, name, version)
+
+    def label(self, name):
+        return self.frames().filter_by(name=name).with_entities(WorkspaceFrame.label).scalar()
+
+    def source(self, name):
+        return self.frames().filter_by(name=name).with_entities(WorkspaceFrame.source).scalar()
+
+    def source_hash(self, name):
+        return self.frames().filter_by(name=name).with_entities(WorkspaceFrame.source_hash).scalar()
+
+    def names(self):
+        return [name for (name,) in self.frames().with_entities(WorkspaceFrame.name).order_by(WorkspaceFrame.id)]
+
+# All session workspaces, listed in the database with their frame files in folder (one folder per workspace)
+# Every web process keeps the frames it used last in memory, within a memory budget
+# Workspaces that haven't been used for ttl_seconds are dropped, together with their frames
+class WorkspaceStore:
+    def __init__(self, max_bytes, ttl_seconds, folder):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.folder = folder
+        # (workspace id, name) to version, frame and size, least recently used first
+        self.in_memory = OrderedDict()
+        self.current_bytes = 0
+        self.last_expired = 0.0
+        self.lock = threading.RLock()
+
+    # Workspace of a session, a new one is created when the id is unknown or expired
+    def get(self, workspace_id=None):
+        now = time.time()
+        self.expire(now)
+
+        record = db.session.get(WorkspaceRecord, workspace_id) if workspace_id else None
+        if record is None or now - record.last_used > self.ttl_seconds:
+            record = WorkspaceRecord(id=uuid.uuid4().hex, last_used=now)
+            db.session.add(record)
+            db.session.commit()
+        elif now - record.last_used > TOUCH_SECONDS:
+            record.last_used = now
+            db.session.commit()
+
+        return Workspace(self, record.id)
+
+    # Keep a frame in memory as the most recently used, dropping the least recently used ones until we are back under budget
+    def remember(self, workspace_id, name, version, df):
+        size = int(df.memory_usage(deep=True).sum())
+
+        with self.lock:
+            self.forget(workspace_id, name)
+            self.in_memory[(workspace_id, name)] = (version, df, size)
+            self.current_bytes += size
+
+            # The frame that was just used stays in memory, even if it is over budget on its own
+            while self.current_bytes > self.max_bytes and len(self.in_memory) > 1:
+                _, (_, _, dropped_size) = self.in_memory.popitem(last=False)
+                self.current_bytes -= dropped_size
+
+    # The frame held in memory, None when it isn't held or is another version
+    def recall(self, workspace_id, name, version):
+        with self.lock:
+            entry = self.in_memory.get((workspace_id, name))
+            if entry is None or entry[0] != version:
+                return None
+
+            self.in_memory.move_to_end((workspace_id, name))
+            return entry[1]
+
+    def forget(self, workspace_id, name):
+        with self.lock:
+            entry = self.in_memory.pop((workspace_id, name), None)
+            if entry is not None:
+                self.current_bytes -= entry[2]
+
+    # File of a stored frame version, every version gets its own file so readers of the old one aren't disturbed
+    def path(self, workspace_id, name, version):
+        return os.path.join(self.folder, workspace_id, f"{name}-{version}.arrow")
+
+    # Drop a version that was replaced or removed, pickled frames have no file
+    def discard(self, workspace_id, name, version):
+        self.forget(workspace_id, name)
+        try:
+            os.remove(self.path(workspace_id, name, version))
+        except OSError:
+            # Already gone, or still mapped by a reader on Windows, the file goes with its workspace folder
+            pass
+
+    # Drop expired workspaces, at most once every TOUCH_SECONDS per web process
+    def expire(self, now):
+        if now - self.last_expired < TOUCH_SECONDS:
+            return
+        self.last_expired = now
+
+        expired_ids = [workspace_id for (workspace_id,) in
+                       db.session.query(WorkspaceRecord.id).filter(WorkspaceRecord.last_used < now - self.ttl_seconds)]
+        if not expired_ids:
+            return
+
+        WorkspaceFrame.query.filter(WorkspaceFrame.workspace_id.in_(expired_ids)).delete(synchronize_session=False)
+        WorkspaceRecord.query.filter(WorkspaceRecord.id.in_(expired_ids)).delete(synchronize_session=False)
+        db.session.commit()
+
+        with self.lock:
+            for workspace_id, name in [key for key in self.in_memory if key[0] in expired_ids]:
+                self.forget(workspace_id, name)
+
+        for workspace_id in expired_ids:
+            shutil.rmtree(os.path.join(self.folder, workspace_id), ignore_errors=True)
+
+    def stats(self):
+        stored_frames, stored_bytes = db.session.query(db.func.count(WorkspaceFrame.id), db.func.sum(WorkspaceFrame.size)).one()
+
+        with self.lock:
+            return {
+                'workspaces': db.session.query(WorkspaceRecord).count(),
+                'frames_stored': stored_frames,
+                'stored_bytes': stored_bytes or 0,
+                'frames_in_memory': len(self.in_memory),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes
+            }
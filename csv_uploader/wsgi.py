@@ -0,0 +1,8 @@
+from app import create_app, init_app
+
+# Entry point for running the app with several web processes behind a WSGI server, for example:
+#   SECRET_KEY=<random text> gunicorn --chdir csv_uploader --workers 4 --timeout 300 --preload wsgi:app
+# Every process shares the database, including the session workspaces and background jobs, and SECRET_KEY
+# makes the session cookies valid in all of them. --preload creates the app and sets up the database once before the
+# processes are started, without it every process does it on its own when it starts.
+app = init_app(create_app())